@@ -0,0 +1,384 @@
+"""Time-partitioned article archive.
+
+Articles are appended to daily segment files, data/articles/YYYY-MM-DD.jsonl,
+chosen by the UTC date of fetched_at. Each segment has a sidecar .urls file
+listing its article URLs, so URL dedupe never has to decode JSONL. Pruning
+deletes whole segments, and readers only open the segments inside the window
+they ask for.
+
+A .minhash sidecar holds the MinHash signature and dup_cluster of each
+article, so repost detection at ingest compares new articles against the
+archive without re-shingling its content every day.
+
+Next to each segment sits a Parquet snapshot with published already converted
+to UTC (from the published_utc field set at ingest), so the weekly digest can
+load the window as typed columns and filter on published while reading.
+Snapshots are rebuilt whenever their segment changes and are skipped entirely
+if pyarrow is not installed.
+
+A legacy single-file archive (data/articles.jsonl) is split into segments the
+first time the store is used.
+"""
+
+import importlib.util
+import json
+import logging
+from datetime import date, datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from similarity import minhash_signature
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path("data")
+ARTICLES_DIR = DATA_DIR / "articles"
+LEGACY_ARTICLES_PATH = DATA_DIR / "articles.jsonl"
+
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+# Fields every stored article has, so an empty window still has a schema
+ARTICLE_COLUMNS = [
+    "uuid", "headline", "published", "published_utc", "summary",
+    "content", "url", "source", "language", "fetched_at",
+]
+
+
+class ArticleStore:
+    def __init__(self, articles_dir: Path = ARTICLES_DIR):
+        self.articles_dir = articles_dir
+        self._urls: set[str] | None = None
+        self._migrating = False
+
+    def exists(self) -> bool:
+        return bool(self.segments())
+
+    def segments(self) -> dict[date, Path]:
+        """Segment files keyed by day, oldest first."""
+        self._migrate_legacy()
+        if not self.articles_dir.exists():
+            return {}
+        segments = {}
+        for path in self.articles_dir.glob("*.jsonl"):
+            try:
+                segments[date.fromisoformat(path.stem)] = path
+            except ValueError:
+                logger.warning("Ignoring unexpected file %s", path)
+        return dict(sorted(segments.items()))
+
+    def urls(self) -> set[str]:
+        """URLs of every stored article."""
+        if self._urls is None:
+            segments = self.segments()
+            self._urls = set()
+            for path in segments.values():
+                self._urls.update(self._segment_urls(path))
+        return self._urls
+
+    def __contains__(self, url: str) -> bool:
+        return url in self.urls()
+
+    def append(
+        self, articles: list[dict], signatures: list[np.ndarray | None] | None = None
+    ) -> None:
+        """Append articles to the segment of their fetched_at day (today if unset).
+
+        signatures, if given, are the articles' MinHash signatures, saving
+        their recomputation for the .minhash sidecars.
+        """
+        if signatures is None:
+            signatures = [minhash_signature(a.get("content") or "") for a in articles]
+        by_day: dict[date, list[tuple[dict, np.ndarray | None]]] = {}
+        today = datetime.now(timezone.utc).date()
+        for article, signature in zip(articles, signatures):
+            by_day.setdefault(_fetched_day(article) or today, []).append((article, signature))
+
+        self.articles_dir.mkdir(parents=True, exist_ok=True)
+        for day, day_entries in by_day.items():
+            day_articles = [article for article, _ in day_entries]
+            path = self._segment_path(day)
+            # A missing or stale sidecar is rebuilt from the segment when read
+            signatures_path = path.with_suffix(".minhash")
+            if path.exists():
+                signatures_fresh = self._is_fresh(signatures_path, path)
+            else:
+                signatures_path.unlink(missing_ok=True)
+                signatures_fresh = True
+            with open(path, "a", encoding="utf-8") as f:
+                for article in day_articles:
+                    f.write(json.dumps(article, ensure_ascii=False) + "\n")
+            urls = [a["url"] for a in day_articles if a.get("url")]
+            with open(path.with_suffix(".urls"), "a", encoding="utf-8") as f:
+                for url in urls:
+                    f.write(url + "\n")
+            if self._urls is not None:
+                self._urls.update(urls)
+            if signatures_fresh:
+                with open(signatures_path, "a", encoding="utf-8") as f:
+                    f.writelines(_signature_lines(day_entries))
+            self._write_snapshot(path)
+
+    def minhash_signatures(
+        self, since: datetime | None = None
+    ) -> tuple[list[str], list[np.ndarray]]:
+        """dup_cluster ids and MinHash signatures of articles fetched on or after since's day.
+
+        Articles too short to have a signature are left out.
+        """
+        clusters: list[str] = []
+        signatures: list[np.ndarray] = []
+        for day, path in self.segments().items():
+            if since is not None and day < since.date():
+                continue
+            for entry in self._segment_signatures(path):
+                clusters.append(entry["dup_cluster"])
+                signatures.append(np.array(entry["signature"], dtype=np.uint64))
+        return clusters, signatures
+
+    def prune(self, days: int) -> tuple[int, int]:
+        """Delete segments whose whole day is more than days old.
+
+        Returns the number of segments and of articles deleted.
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+        segments = articles = 0
+        for day, path in self.segments().items():
+            if day >= cutoff.date():
+                break
+            with open(path, encoding="utf-8") as f:
+                articles += sum(1 for line in f if line.strip())
+            segments += 1
+            path.unlink()
+            path.with_suffix(".urls").unlink(missing_ok=True)
+            path.with_suffix(".parquet").unlink(missing_ok=True)
+            path.with_suffix(".minhash").unlink(missing_ok=True)
+            logger.info("Deleted segment %s", path.name)
+        if segments:
+            self._urls = None
+        return segments, articles
+
+    def load_frame(
+        self,
+        since: datetime | None = None,
+        published_after: datetime | None = None,
+    ) -> pd.DataFrame:
+        """Articles fetched on or after since's day (all articles if None).
+
+        With published_after, only articles published strictly later are
+        returned; when snapshots are available the filter is applied while
+        reading, and published comes back as a UTC datetime column.
+        """
+        paths = [
+            path
+            for day, path in self.segments().items()
+            if since is None or day >= since.date()
+        ]
+        if not paths:
+            return pd.DataFrame(columns=ARTICLE_COLUMNS).astype(
+                {"published": "datetime64[ns, UTC]"}
+            )
+
+        if HAS_PYARROW:
+            filters = None
+            if published_after is not None:
+                filters = [("published", ">", pd.Timestamp(published_after))]
+            frames = [
+                pd.read_parquet(self._snapshot(path), filters=filters) for path in paths
+            ]
+        else:
+            frames = [pd.read_json(path, lines=True) for path in paths]
+        df = pd.concat(frames, ignore_index=True)
+
+        if published_after is not None and not HAS_PYARROW:
+            df = df[normalise_published(df) > pd.Timestamp(published_after)]
+            df = df.reset_index(drop=True)
+        return df
+
+    def backfill_published_utc(self) -> int:
+        """One-off: add published_utc to stored articles that predate it.
+
+        Rewrites only the segments that need it. Returns number of articles
+        updated.
+        """
+        updated = 0
+        for path in self.segments().values():
+            articles = []
+            changed = False
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        article = json.loads(line)
+                    except json.JSONDecodeError:
+                        logger.warning("Dropping corrupt JSONL line in %s", path.name)
+                        changed = True
+                        continue
+                    if "published_utc" not in article:
+                        article["published_utc"] = parse_published(article.get("published"))
+                        updated += 1
+                        changed = True
+                    articles.append(article)
+            if not changed:
+                continue
+            tmp_path = path.with_suffix(".jsonl.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for article in articles:
+                    f.write(json.dumps(article, ensure_ascii=False) + "\n")
+            tmp_path.replace(path)
+            self._write_snapshot(path)
+        return updated
+
+    def _snapshot(self, path: Path) -> Path:
+        """Parquet snapshot of a segment, rebuilt if missing or stale."""
+        snapshot_path = path.with_suffix(".parquet")
+        if not snapshot_path.exists() or snapshot_path.stat().st_mtime < path.stat().st_mtime:
+            self._write_snapshot(path)
+        return snapshot_path
+
+    def _write_snapshot(self, path: Path) -> None:
+        if not HAS_PYARROW:
+            return
+        df = pd.read_json(path, lines=True)
+        if "published" in df.columns:
+            df["published"] = normalise_published(df)
+        if "language" in df.columns:
+            df["language"] = df["language"].fillna("zh")
+        tmp_path = path.with_suffix(".parquet.tmp")
+        df.to_parquet(tmp_path, index=False)
+        tmp_path.replace(path.with_suffix(".parquet"))
+
+    def _segment_path(self, day: date) -> Path:
+        return self.articles_dir / f"{day.isoformat()}.jsonl"
+
+    def _segment_urls(self, path: Path) -> list[str]:
+        """URLs in a segment, from its .urls sidecar, rebuilt if missing or stale."""
+        urls_path = path.with_suffix(".urls")
+        if urls_path.exists() and urls_path.stat().st_mtime >= path.stat().st_mtime:
+            return urls_path.read_text(encoding="utf-8").splitlines()
+
+        urls = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    url = json.loads(line).get("url")
+                except json.JSONDecodeError:
+                    logger.warning("Skipping corrupt JSONL line in %s", path.name)
+                    continue
+                if url:
+                    urls.append(url)
+        urls_path.write_text("".join(url + "\n" for url in urls), encoding="utf-8")
+        return urls
+
+    def _segment_signatures(self, path: Path) -> list[dict]:
+        """Entries of a segment's .minhash sidecar, rebuilt if missing or stale."""
+        signatures_path = path.with_suffix(".minhash")
+        if self._is_fresh(signatures_path, path):
+            with open(signatures_path, encoding="utf-8") as f:
+                return [json.loads(line) for line in f if line.strip()]
+
+        entries = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    article = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning("Skipping corrupt JSONL line in %s", path.name)
+                    continue
+                entries.append((article, minhash_signature(article.get("content") or "")))
+        lines = _signature_lines(entries)
+        signatures_path.write_text("".join(lines), encoding="utf-8")
+        return [json.loads(line) for line in lines]
+
+    @staticmethod
+    def _is_fresh(sidecar: Path, path: Path) -> bool:
+        return sidecar.exists() and sidecar.stat().st_mtime >= path.stat().st_mtime
+
+    def _migrate_legacy(self) -> None:
+        """Split the old single-file archive into daily segments, once."""
+        if self._migrating or not LEGACY_ARTICLES_PATH.exists():
+            return
+        self._migrating = True
+        articles = []
+        with open(LEGACY_ARTICLES_PATH, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    articles.append(json.loads(line))
+                except json.JSONDecodeError:
+                    logger.warning("Dropping corrupt JSONL line during migration")
+        # Skip anything an interrupted earlier migration already wrote
+        existing = self.urls()
+        self.append([a for a in articles if not a.get("url") or a["url"] not in existing])
+        LEGACY_ARTICLES_PATH.unlink()
+        self._urls = None
+        self._migrating = False
+        logger.info(
+            "Migrated %d articles from %s into daily segments",
+            len(articles), LEGACY_ARTICLES_PATH,
+        )
+
+
+def _signature_lines(entries: list[tuple[dict, np.ndarray | None]]) -> list[str]:
+    """.minhash sidecar lines for (article, signature) pairs that have a signature."""
+    return [
+        json.dumps({
+            "uuid": article.get("uuid"),
+            "dup_cluster": article.get("dup_cluster") or article.get("uuid"),
+            "signature": signature.tolist(),
+        }) + "\n"
+        for article, signature in entries
+        if signature is not None
+    ]
+
+
+def parse_published(published: str | None) -> str | None:
+    """Canonical UTC ISO timestamp for a raw feed date string, if parseable."""
+    if not published:
+        return None
+    try:
+        ts = parsedate_to_datetime(published)
+    except (TypeError, ValueError):
+        try:
+            ts = pd.Timestamp(published).to_pydatetime()
+        except ValueError:
+            return None
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.astimezone(timezone.utc).isoformat()
+
+
+def normalise_published(df: pd.DataFrame) -> pd.Series:
+    """published as UTC datetimes, preferring the canonical published_utc field.
+
+    Only rows without published_utc fall back to parsing the raw string.
+    """
+    if pd.api.types.is_datetime64_any_dtype(df["published"]):
+        return df["published"]
+    if "published_utc" not in df.columns:
+        return pd.to_datetime(df["published"], utc=True, format="mixed", errors="coerce")
+    published = pd.to_datetime(df["published_utc"], utc=True, format="ISO8601", errors="coerce")
+    missing = df["published_utc"].isna()
+    if missing.any():
+        published[missing] = pd.to_datetime(
+            df.loc[missing, "published"], utc=True, format="mixed", errors="coerce"
+        )
+    return published
+
+
+def _fetched_day(article: dict) -> date | None:
+    fetched_at = article.get("fetched_at")
+    if not fetched_at:
+        return None
+    try:
+        return datetime.fromisoformat(fetched_at).astimezone(timezone.utc).date()
+    except ValueError:
+        return None
@@ -0,0 +1,71 @@
+"""On-disk HTTP validator cache for RSS feed polling.
+
+Stores the ETag / Last-Modified validators of each feed URL so that repeat
+polls can send conditional requests and skip parsing when the server answers
+304 Not Modified.
+"""
+
+import json
+import logging
+import threading
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class FeedCache:
+    """Per-URL validators plus the size and parse time of the last full fetch."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: dict[str, dict] = {}
+        self.not_modified = 0
+        self.bytes_saved = 0
+        self.parse_seconds_saved = 0.0
+        if path.exists():
+            try:
+                self._entries = json.loads(path.read_text(encoding="utf-8"))
+            except (json.JSONDecodeError, OSError) as e:
+                logger.warning("Ignoring unreadable feed cache %s: %s", path, e)
+
+    def conditional_headers(self, url: str) -> dict[str, str]:
+        """Headers to turn a GET for url into a conditional request."""
+        with self._lock:
+            entry = self._entries.get(url, {})
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def record_fetch(
+        self, url: str, response_headers, n_bytes: int, parse_seconds: float
+    ) -> None:
+        """Remember validators from a full 200 response."""
+        entry = {
+            "etag": response_headers.get("ETag"),
+            "last_modified": response_headers.get("Last-Modified"),
+            "bytes": n_bytes,
+            "parse_seconds": parse_seconds,
+        }
+        with self._lock:
+            if entry["etag"] or entry["last_modified"]:
+                self._entries[url] = entry
+            else:
+                # Server gives us nothing to validate against next time
+                self._entries.pop(url, None)
+
+    def record_not_modified(self, url: str) -> None:
+        """Count the transfer and parse avoided by a 304 response."""
+        with self._lock:
+            entry = self._entries.get(url, {})
+            self.not_modified += 1
+            self.bytes_saved += entry.get("bytes", 0)
+            self.parse_seconds_saved += entry.get("parse_seconds", 0.0)
+
+    def save(self) -> None:
+        with self._lock:
+            data = json.dumps(self._entries, ensure_ascii=False, indent=2)
+        self.path.write_text(data, encoding="utf-8")
@@ -1,94 +1,59 @@
 """Daily RSS article accumulator.
 
-Fetches articles from RSS feeds and appends new ones to a JSONL file.
-Deduplicates by URL and prunes articles older than 10 days.
+Fetches articles from RSS feeds and appends new ones to daily JSONL segments.
+Deduplicates by URL and prunes segments older than 10 days. Feeds are polled
+with conditional requests so unchanged feeds are neither downloaded nor parsed.
+New articles are tagged with a dup_cluster id shared with any near-duplicate
+(reposted or wire) article already fetched in the archive window.
 No Gemini or Substack calls — safe to run on GitHub-hosted runners.
 """
 
-import json
+import argparse
 import logging
 from datetime import datetime, timedelta, timezone
-from pathlib import Path
 
+import numpy as np
+
+from article_store import ArticleStore, DATA_DIR
+from feed_cache import FeedCache
+from scrape_cache import ScrapeCache
+from similarity import earliest_duplicates, minhash_signature
 from utils import extract_news_data
 from main import RSS_FEEDS, ENGLISH_SOURCES
 
-DATA_DIR = Path("data")
-ARTICLES_PATH = DATA_DIR / "articles.jsonl"
+FEED_CACHE_PATH = DATA_DIR / "feed_cache.json"
+SCRAPE_CACHE_PATH = DATA_DIR / "scrape_cache.sqlite"
 PRUNE_DAYS = 10
 
 logger = logging.getLogger(__name__)
 
 
-def load_existing_urls() -> set[str]:
-    """Load URLs from existing JSONL to deduplicate."""
-    urls: set[str] = set()
-    if not ARTICLES_PATH.exists():
-        return urls
-    with open(ARTICLES_PATH, encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                article = json.loads(line)
-                if article.get("url"):
-                    urls.add(article["url"])
-            except json.JSONDecodeError:
-                logger.warning("Skipping corrupt JSONL line")
-    return urls
-
-
-def append_articles(articles: list[dict]) -> None:
-    """Append articles to JSONL file."""
-    with open(ARTICLES_PATH, "a", encoding="utf-8") as f:
-        for article in articles:
-            f.write(json.dumps(article, ensure_ascii=False) + "\n")
-
-
-def prune_old_articles() -> int:
-    """Remove articles older than PRUNE_DAYS. Returns number pruned."""
-    if not ARTICLES_PATH.exists():
-        return 0
-    cutoff = datetime.now(timezone.utc) - timedelta(days=PRUNE_DAYS)
-    kept: list[str] = []
-    pruned = 0
-    with open(ARTICLES_PATH, encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                article = json.loads(line)
-            except json.JSONDecodeError:
-                logger.warning("Dropping corrupt JSONL line during prune")
-                pruned += 1
-                continue
-            fetched_at = article.get("fetched_at")
-            if fetched_at:
-                try:
-                    ts = datetime.fromisoformat(fetched_at)
-                    if ts < cutoff:
-                        pruned += 1
-                        continue
-                except ValueError:
-                    pass
-            kept.append(json.dumps(article, ensure_ascii=False))
-    with open(ARTICLES_PATH, "w", encoding="utf-8") as f:
-        for entry in kept:
-            f.write(entry + "\n")
-    return pruned
-
-
 def main() -> None:
     logging.basicConfig(level=logging.INFO)
 
     DATA_DIR.mkdir(exist_ok=True)
 
-    existing_urls = load_existing_urls()
+    store = ArticleStore()
+    existing_urls = store.urls()
     logger.info("Existing articles: %d", len(existing_urls))
 
-    raw_articles = extract_news_data(RSS_FEEDS, english_sources=ENGLISH_SOURCES)
+    # Conditional requests are only safe while the articles they already
+    # delivered are still on disk; start from scratch if the archive is gone.
+    if not existing_urls and FEED_CACHE_PATH.exists():
+        FEED_CACHE_PATH.unlink()
+    feed_cache = FeedCache(FEED_CACHE_PATH)
+    scrape_cache = ScrapeCache(SCRAPE_CACHE_PATH, ttl_days=PRUNE_DAYS)
+
+    try:
+        raw_articles = extract_news_data(
+            RSS_FEEDS,
+            english_sources=ENGLISH_SOURCES,
+            feed_cache=feed_cache,
+            known_urls=existing_urls,
+            scrape_cache=scrape_cache,
+        )
+    finally:
+        scrape_cache.close()
     now = datetime.now(timezone.utc).isoformat()
 
     new_articles = []
@@ -98,13 +63,59 @@ def main() -> None:
             new_articles.append(article)
 
     if new_articles:
-        append_articles(new_articles)
+        signatures = tag_duplicate_clusters(new_articles, store)
+        store.append(new_articles, signatures)
+    feed_cache.save()
     logger.info("Fetched %d articles, %d new", len(raw_articles), len(new_articles))
 
-    pruned = prune_old_articles()
-    if pruned:
-        logger.info("Pruned %d old articles", pruned)
+    segments, articles = store.prune(PRUNE_DAYS)
+    if segments:
+        logger.info("Pruned %d old segments (%d articles)", segments, articles)
+
+
+def tag_duplicate_clusters(
+    new_articles: list[dict], store: ArticleStore
+) -> list[np.ndarray | None]:
+    """Set dup_cluster on each new article: the id of the earliest near-duplicate of its content.
+
+    Articles stored in the last PRUNE_DAYS take precedence, so a repost
+    joins the cluster its original was given; an article with no
+    near-duplicate is its own cluster. Stored articles are compared by their
+    saved signatures only. Returns the new articles' signatures.
+    """
+    since = datetime.now(timezone.utc) - timedelta(days=PRUNE_DAYS)
+    cluster_ids, stored_signatures = store.minhash_signatures(since=since)
+    signatures = [minhash_signature(a.get("content") or "") for a in new_articles]
+
+    matches = earliest_duplicates(stored_signatures + signatures, first_new=len(stored_signatures))
+    duplicates = 0
+    for article, match in zip(new_articles, matches):
+        cluster_ids.append(article["uuid"] if match == len(cluster_ids) else cluster_ids[match])
+        article["dup_cluster"] = cluster_ids[-1]
+        duplicates += article["dup_cluster"] != article["uuid"]
+    logger.info(
+        "Tagged %d of %d new articles as near-duplicates of %d stored",
+        duplicates, len(new_articles), len(stored_signatures),
+    )
+    return signatures
+
+
+def backfill_published_utc() -> None:
+    """One-off migration: add published_utc to articles stored before it existed."""
+    logging.basicConfig(level=logging.INFO)
+    updated = ArticleStore().backfill_published_utc()
+    logger.info("Backfilled published_utc for %d articles", updated)
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Fetch RSS articles into the local archive")
+    parser.add_argument(
+        "--backfill-published-utc",
+        action="store_true",
+        help="Add published_utc to already stored articles instead of fetching",
+    )
+    args = parser.parse_args()
+    if args.backfill_published_utc:
+        backfill_published_utc()
+    else:
+        main()
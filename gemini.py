@@ -1,14 +1,21 @@
 import json
 import logging
 import os
+import re
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date
 
+import httpx
 import pandas as pd
 from google import genai
 from google.genai import types
 import dotenv
 from pydantic import BaseModel
-from utils import extract_json_to_dict
+from response_cache import ResponseCache, response_key
+from utils import extract_json_to_dict, pack_articles, parse_partial_json
 from tenacity import (
     retry,
     stop_after_attempt,
@@ -17,12 +24,14 @@ from tenacity import (
 )
 
 from response_model import (
-    is_valid_response,
+    validation_error,
     TopicsList,
     TopicSummary,
     TopicsSummary,
     ArticlesByTopic,
     SelectedArticles,
+    TitleFixes,
+    Glossary,
 )
 
 dotenv.load_dotenv()
@@ -35,6 +44,18 @@ MAX_UUID_VALIDATION_ATTEMPTS = 5
 
 GEMINI_TIMEOUT = 150_000  # milliseconds per request; heaviest calls (~18k tokens) take ~60s
 
+# Estimated tokens allowed for the article listing in the topic and grouping
+# prompts; summaries are trimmed evenly beyond this. The estimate errs high
+# for Chinese, so the default sits above the heaviest week seen so far.
+PROMPT_TOKEN_BUDGET = int(os.environ.get("GEMINI_PROMPT_TOKEN_BUDGET", "24000"))
+
+# Connections kept open to the Gemini API, shared by every thread in the process
+GEMINI_POOL_SIZE = int(os.environ.get("GEMINI_POOL_SIZE", "10"))
+GEMINI_KEEPALIVE = 60  # seconds an idle pooled connection is kept for reuse
+
+# Windows larger than this are grouped by topic in concurrent shards of this size
+GROUPING_SHARD_SIZE = int(os.environ.get("GEMINI_GROUPING_SHARD_SIZE", "200"))
+
 generate_content_config = types.GenerateContentConfig(
     temperature=1,
     top_p=0.95,
@@ -54,6 +75,59 @@ generate_content_config = types.GenerateContentConfig(
 )
 
 
+_clients: dict[str, genai.Client] = {}
+_clients_lock = threading.Lock()
+_call_timing = threading.local()
+_response_cache: ResponseCache | None = None
+
+
+def _trace_connection(event_name: str, info: dict) -> None:
+    """httpcore trace hook: accumulate time spent opening TCP/TLS connections."""
+    if event_name.endswith(".started"):
+        _call_timing.started = time.perf_counter()
+    elif event_name in (
+        "connection.connect_tcp.complete",
+        "connection.start_tls.complete",
+    ):
+        _call_timing.connect += time.perf_counter() - _call_timing.started
+
+
+def _attach_trace(request: httpx.Request) -> None:
+    request.extensions["trace"] = _trace_connection
+
+
+def get_client() -> genai.Client:
+    """Process-wide Gemini client for the current API key.
+
+    The client's HTTP connection pool is shared across threads and retries,
+    so only the first call per connection pays for the TLS handshake.
+    """
+    api_key = os.environ["GEMINI_API_KEY"]
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            limits = httpx.Limits(
+                max_connections=GEMINI_POOL_SIZE,
+                max_keepalive_connections=GEMINI_POOL_SIZE,
+                keepalive_expiry=GEMINI_KEEPALIVE,
+            )
+            client = genai.Client(
+                api_key=api_key,
+                http_options=types.HttpOptions(
+                    client_args={"limits": limits, "event_hooks": {"request": [_attach_trace]}},
+                    async_client_args={"limits": limits},
+                ),
+            )
+            _clients[api_key] = client
+    return client
+
+
+def set_response_cache(cache: ResponseCache | None) -> None:
+    """Serve and store generate_response results through cache (None disables)."""
+    global _response_cache
+    _response_cache = cache
+
+
 @retry(
     stop=stop_after_attempt(10),
     wait=wait_exponential(multiplier=1, min=2, max=60),
@@ -64,57 +138,248 @@ def generate_response(
     validation_class: type[BaseModel] | None = None,
     lang: str = "tc",
     model: str = MODEL,
+    refresh: bool = False,
+    on_partial: Callable[[dict], None] | None = None,
 ) -> dict | str:
+    """Call Gemini, validating JSON output against validation_class if given.
+
+    With a response cache set, a cached response is returned without calling
+    the API unless refresh is set (callers regenerating a response that
+    failed their own checks). Only valid responses are cached.
+
+    With on_partial, the response is streamed and on_partial is called with
+    the JSON parsed so far (unvalidated) each time more text arrives.
+    """
     system_prompt = {
         "tc": "**所有輸出都必須使用繁體中文。**\n\n",
         "sc": "**所有输出都必须使用简体中文。**\n\n",
         "en": "**All output should be in English only.**\n\n",
     }
     full_prompt = system_prompt[lang] + prompt
-    client = genai.Client(api_key=os.environ["GEMINI_API_KEY"])
-
-    response = None
+    _call_timing.tokens = 0
+    _call_timing.seconds = 0.0
+
+    cache_key = None
+    if _response_cache is not None:
+        cache_key = response_key(
+            model,
+            generate_content_config.model_dump(
+                mode="json", exclude_none=True, exclude={"http_options"}
+            ),
+            lang,
+            full_prompt,
+            validation_class,
+        )
+        if not refresh:
+            cached = _response_cache.get(cache_key)
+            if cached is not None:
+                logger.info("Response cache hit %s", cache_key[:12])
+                return cached
+
+    on_text = _partial_json_listener(on_partial) if on_partial is not None else None
+    result = None
     try:
+        result = _call_model(full_prompt, model, on_text)
+
+        if validation_class is not None:
+            error = _json_error(result, validation_class)
+            if error is not None:
+                result = _repair_json(result, error, validation_class, lang, model)
+            result = extract_json_to_dict(result)
+
+        if cache_key is not None:
+            _response_cache.put(cache_key, result)
+        return result
+
+    except Exception as e:
+        response_text = result if result is not None else "(no response)"
+        with open("temp/error.txt", "w", encoding="utf-8") as f:
+            f.write(f"Prompt: {prompt}\n\n Response: {response_text}\n\n Error: {e}")
+        logger.error("Error: %s", e)
+        raise
+
+
+def _call_model(
+    contents: str, model: str, on_text: Callable[[str], None] | None = None
+) -> str:
+    """One generate_content call, adding its tokens and seconds to the call's cost.
+
+    With on_text, the response is streamed and on_text is called with the
+    text received so far after every chunk.
+    """
+    client = get_client()
+    _call_timing.connect = 0.0
+    start = time.perf_counter()
+    if on_text is None:
         response = client.models.generate_content(
             model=model,
             config=generate_content_config,
-            contents=[full_prompt],
+            contents=[contents],
         )
+        text = response.text
+    else:
+        response, text = _stream_model(client, contents, model, on_text, start)
+    elapsed = time.perf_counter() - start
+    logger.info(
+        "Latency — total: %.2fs, connection setup: %.2fs, request/generation: %.2fs",
+        elapsed,
+        _call_timing.connect,
+        elapsed - _call_timing.connect,
+    )
 
-        finish_reason = response.candidates[0].finish_reason if response.candidates else None
-        logger.info(
-            "Tokens — input: %d, output: %d, thinking: %d, finish: %s",
-            response.usage_metadata.prompt_token_count,
-            response.usage_metadata.candidates_token_count,
-            getattr(response.usage_metadata, 'thoughts_token_count', 0),
-            finish_reason,
+    usage = response.usage_metadata
+    finish_reason = response.candidates[0].finish_reason if response.candidates else None
+    logger.info(
+        "Tokens — input: %d, output: %d, thinking: %d, finish: %s",
+        usage.prompt_token_count,
+        usage.candidates_token_count,
+        getattr(usage, 'thoughts_token_count', 0),
+        finish_reason,
+    )
+    _call_timing.tokens += (usage.total_token_count or 0)
+    _call_timing.seconds += elapsed
+
+    if text is None:
+        safety = getattr(response.candidates[0], "safety_ratings", None) if response.candidates else None
+        raise ValueError(
+            f"Gemini returned no text (finish_reason={finish_reason}, safety={safety})"
         )
+    return text.strip()
 
-        if response.text is None:
-            safety = getattr(response.candidates[0], "safety_ratings", None) if response.candidates else None
-            raise ValueError(
-                f"Gemini returned no text (finish_reason={finish_reason}, safety={safety})"
-            )
-        result = response.text.strip()
 
-        if validation_class is not None:
-            json_result = extract_json_to_dict(result)
-            if not is_valid_response(json_result, validation_class):
-                raise ValueError("Invalid response format. Regenerating....")
-            return json_result
-        else:
-            return result
+def _partial_json_listener(on_partial: Callable[[dict], None]) -> Callable[[str], None]:
+    """on_text callback feeding on_partial with each parseable prefix of the output.
 
-    except Exception as e:
-        response_text = response.text if response else "(no response)"
-        with open("temp/error.txt", "w", encoding="utf-8") as f:
-            f.write(f"Prompt: {prompt}\n\n Response: {response_text}\n\n Error: {e}")
-        logger.error("Error: %s", e)
-        raise
+    on_partial is informational only: if it raises, the error is logged and
+    it is not called again for this response, but generation carries on
+    rather than being aborted and retried.
+    """
+    failed = False
+
+    def on_text(text: str) -> None:
+        nonlocal failed
+        if failed:
+            return
+        partial = parse_partial_json(text)
+        if not partial:
+            return
+        try:
+            on_partial(partial)
+        except Exception:
+            failed = True
+            logger.warning("Partial output callback failed, ignoring it", exc_info=True)
+
+    return on_text
+
+
+def _stream_model(
+    client: genai.Client,
+    contents: str,
+    model: str,
+    on_text: Callable[[str], None],
+    start: float,
+) -> tuple[types.GenerateContentResponse, str | None]:
+    """Stream a response; returns the last chunk (carrying usage and finish reason) and the full text."""
+    parts: list[str] = []
+    response = None
+    for chunk in client.models.generate_content_stream(
+        model=model,
+        config=generate_content_config,
+        contents=[contents],
+    ):
+        if response is None:
+            logger.info("Time to first chunk: %.2fs", time.perf_counter() - start)
+        response = chunk
+        if chunk.text:
+            parts.append(chunk.text)
+            on_text("".join(parts))
+    if response is None:
+        raise ValueError("Gemini stream ended without a response")
+    return response, "".join(parts) if parts else None
+
+
+def last_call_cost() -> tuple[int, float]:
+    """Tokens and seconds spent by this thread's last generate_response (0 on a cache hit)."""
+    return getattr(_call_timing, "tokens", 0), getattr(_call_timing, "seconds", 0.0)
+
+
+def _json_error(text: str, validation_class: type[BaseModel]) -> str | None:
+    """Why text is not a valid validation_class JSON block, or None if it is."""
+    try:
+        data = extract_json_to_dict(text)
+    except json.JSONDecodeError as e:
+        return f"Invalid JSON: {e}"
+    if data is None:
+        return "No ```json code block found"
+    return validation_error(data, validation_class)
+
+
+def _repair_json(
+    text: str,
+    error: str,
+    validation_class: type[BaseModel],
+    lang: str,
+    model: str,
+) -> str:
+    """Ask the model to fix its own invalid JSON instead of regenerating from the full prompt."""
+    full_tokens, full_seconds = last_call_cost()
+    prompt = f"""
+    The JSON below does not match the required schema. Fix only what the errors require and keep all other content unchanged.
+
+    Errors:
+    {error}
+
+    Schema:
+    {validation_class.model_json_schema()}
+
+    JSON:
+    {text}
+
+    Return the corrected JSON in a ```json code block.
+    """
+    logger.warning("Invalid response format (%s). Repairing...", error.splitlines()[0])
+    repaired = _call_model(prompt, model)
+    repair_error = _json_error(repaired, validation_class)
+    if repair_error is not None:
+        raise ValueError("Invalid response format after repair. Regenerating....")
+
+    tokens, seconds = last_call_cost()
+    repair_stats.record(full_tokens, full_seconds, tokens - full_tokens, seconds - full_seconds)
+    return repaired
+
+
+class RepairStats:
+    """Running totals of what partial repairs saved over full regeneration.
+
+    A full regeneration is assumed to cost what the original call did.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.repairs = 0
+        self.tokens_saved = 0
+        self.seconds_saved = 0.0
+
+    def record(
+        self, full_tokens: int, full_seconds: float, repair_tokens: int, repair_seconds: float
+    ) -> None:
+        if not full_tokens:
+            return  # Original came from the response cache; nothing to compare
+        with self._lock:
+            self.repairs += 1
+            self.tokens_saved += full_tokens - repair_tokens
+            self.seconds_saved += full_seconds - repair_seconds
+        logger.info(
+            "Repair used %d tokens / %.1fs instead of ~%d tokens / %.1fs",
+            repair_tokens, repair_seconds, full_tokens, full_seconds,
+        )
+
+
+repair_stats = RepairStats()
 
 
 def generate_topics(df: pd.DataFrame, number_of_topics: int = 5) -> dict:
-    article_list = df[["headline", "summary"]].to_dict(orient="records")
+    article_list = pack_articles(df, PROMPT_TOKEN_BUDGET)
 
     prompt = f"""
     You are a news editor for a Hong Kong news website. These are a list of news articles headlines and content. Identify the top {number_of_topics} major topics that was reported.
@@ -134,8 +399,8 @@ def generate_topics(df: pd.DataFrame, number_of_topics: int = 5) -> dict:
 
     Summarise each topic into a concise, news headline format.
 
-    Articles:
-    {article_list}
+    Articles, one per line as "id | headline | summary". A headline ending in (×n) stands for n reports of the same story by different outlets:
+{article_list}
 
     Your output should be in JSON format.
     Schema:
@@ -146,81 +411,199 @@ def generate_topics(df: pd.DataFrame, number_of_topics: int = 5) -> dict:
     return generate_response(prompt=prompt, validation_class=TopicsList)
 
 
-def generate_articles_list_by_topic(
-    major_themes: dict, headlines: pd.DataFrame
-) -> dict:
-    # Use sequential integer IDs instead of UUIDs — verbatim copying of
-    # 32-char hex UUIDs is unreliable; small integers are not.
-    idx_to_uuid: dict[str, str] = {}
-    article_list = []
-    for i, (uuid_, row) in enumerate(headlines.iterrows(), start=1):
-        sid = str(i)
-        idx_to_uuid[sid] = uuid_
-        article_list.append({"id": sid, "headline": row.headline, "summary": row.summary})
-
-    prompt = f"""
+def _grouping_prompt(major_themes: dict, article_list: str, keep_all_themes: bool = False) -> str:
+    theme_rule = (
+        " Return every theme, in the order given and with its name unchanged, even if no article below fits it."
+        if keep_all_themes
+        else ""
+    )
+    return f"""
     You are a news editor for a Hong Kong news website. These are a number of major themes that we will cover.
 
     Major Themes:
     {major_themes}
 
-    Here are a list of headlines and summaries with the article id. Try to group them under the major themes provided. Only include articles that fit the major themes. Skip articles that do not fit any theme or are purely international news with no direct Hong Kong relevance.
+    Here are a list of headlines and summaries with the article id. Try to group them under the major themes provided. Only include articles that fit the major themes. Skip articles that do not fit any theme or are purely international news with no direct Hong Kong relevance.{theme_rule}
 
-    Headlines, summaries & id:
-    {article_list}
+    Articles, one per line as "id | headline | summary". A headline ending in (×n) stands for n reports of the same story by different outlets:
+{article_list}
 
     Your output should be in JSON format. The "articles" field for each topic should be a list of id strings.
     Schema:
     {ArticlesByTopic.model_json_schema()}
     """
-    valid_ids = set(idx_to_uuid.keys())
+
+
+def generate_articles_list_by_topic(
+    major_themes: dict, headlines: pd.DataFrame
+) -> dict:
+    # Use sequential integer IDs instead of UUIDs — verbatim copying of
+    # 32-char hex UUIDs is unreliable; small integers are not.
+    idx_to_uuid = {str(i): uuid_ for i, uuid_ in enumerate(headlines.index, start=1)}
+    if len(headlines) > GROUPING_SHARD_SIZE:
+        return _group_articles_sharded(major_themes, headlines, idx_to_uuid)
+
+    prompt = _grouping_prompt(major_themes, pack_articles(headlines, PROMPT_TOKEN_BUDGET))
+
+    logger.info("Generating articles list by topic...")
+    output = generate_response(prompt=prompt, validation_class=ArticlesByTopic)
+    headline_by_id = dict(zip(idx_to_uuid, headlines["headline"]))
+    output = _repair_assignments(output, headline_by_id, require_articles=True)
+    _map_ids_to_uuids(output, idx_to_uuid)
+    return output
+
+
+def _group_articles_sharded(
+    major_themes: dict, headlines: pd.DataFrame, idx_to_uuid: dict[str, str]
+) -> dict:
+    """Map-reduce grouping: classify shards of the window concurrently, then merge.
+
+    Ids stay global across shards, and each shard only retries itself.
+    """
+    starts = range(1, len(headlines) + 1, GROUPING_SHARD_SIZE)
+    logger.info(
+        "Grouping %d articles in %d shards of up to %d",
+        len(headlines), len(starts), GROUPING_SHARD_SIZE,
+    )
+    with ThreadPoolExecutor(max_workers=GEMINI_POOL_SIZE) as executor:
+        shard_outputs = list(executor.map(
+            lambda start: _group_shard(
+                major_themes, headlines.iloc[start - 1:start - 1 + GROUPING_SHARD_SIZE], start
+            ),
+            starts,
+        ))
+
+    output = {"topics": [{"topic": theme, "articles": []} for theme in major_themes["topics"]]}
+    merged_by_theme = {topic["topic"]: topic for topic in output["topics"]}
+    for shard_output in shard_outputs:
+        for topic in shard_output["topics"]:
+            merged_by_theme[topic["topic"]]["articles"].extend(topic["articles"])
+
+    empty_topics = [t["topic"] for t in output["topics"] if not t["articles"]]
+    if empty_topics:
+        logger.warning(
+            "Dropping %d topic(s) with no matched articles in any shard: %s",
+            len(empty_topics),
+            empty_topics,
+        )
+        output["topics"] = [t for t in output["topics"] if t["articles"]]
+    _map_ids_to_uuids(output, idx_to_uuid)
+    return output
+
+
+def _group_shard(major_themes: dict, shard: pd.DataFrame, start: int) -> dict:
+    """Group one shard, whose articles have ids start .. start + len(shard) - 1."""
+    end = start + len(shard) - 1
+    prompt = _grouping_prompt(
+        major_themes, pack_articles(shard, PROMPT_TOKEN_BUDGET, start=start), keep_all_themes=True
+    )
+    themes = major_themes["topics"]
 
     for attempt in range(1, MAX_UUID_VALIDATION_ATTEMPTS + 1):
         logger.info(
-            "Generating articles list by topic (attempt %d/%d)...",
-            attempt,
-            MAX_UUID_VALIDATION_ATTEMPTS,
+            "Grouping articles %d-%d by topic (attempt %d/%d)...",
+            start, end, attempt, MAX_UUID_VALIDATION_ATTEMPTS,
         )
-        output = generate_response(prompt=prompt, validation_class=ArticlesByTopic)
-
-        has_valid_ids = all(
-            aid in valid_ids
-            for topic in output["topics"]
-            for aid in topic["articles"]
+        output = generate_response(
+            prompt=prompt, validation_class=ArticlesByTopic, refresh=attempt > 1
         )
-        empty_topics = [
-            topic["topic"]
-            for topic in output["topics"]
-            if len(topic["articles"]) == 0
-        ]
-
-        if has_valid_ids and not empty_topics:
-            _map_ids_to_uuids(output, idx_to_uuid)
-            return output
-        if not has_valid_ids:
-            logger.warning("Invalid id in output. Regenerating...")
-        if empty_topics:
-            logger.warning("Empty articles for topics: %s. Regenerating...", empty_topics)
-
-    # After all retries: if ids are valid, drop empty topics and proceed
-    if has_valid_ids and empty_topics:
+        by_theme = {topic["topic"].strip(): topic for topic in output["topics"]}
+        if len(output["topics"]) == len(themes) and set(by_theme) == {t.strip() for t in themes}:
+            # Shards are merged by theme name, so put them back in the given
+            # order under the exact given names
+            output["topics"] = [
+                {"topic": theme, "articles": by_theme[theme.strip()]["articles"]}
+                for theme in themes
+            ]
+            headline_by_id = {
+                str(i): headline for i, headline in enumerate(shard["headline"], start=start)
+            }
+            # A shard may legitimately have nothing for some themes
+            return _repair_assignments(output, headline_by_id, require_articles=False)
         logger.warning(
-            "Dropping %d topic(s) with no matched articles after %d attempts: %s",
+            "Shard %d-%d returned topics %s instead of the given themes. Regenerating shard...",
+            start, end, [topic["topic"] for topic in output["topics"]],
+        )
+
+    raise RuntimeError(
+        f"Failed to group articles {start}-{end} after {MAX_UUID_VALIDATION_ATTEMPTS} attempts"
+    )
+
+
+def _repair_assignments(output: dict, headline_by_id: dict[str, str], require_articles: bool) -> dict:
+    """Fix an article-to-topic assignment in place of regenerating it.
+
+    Valid ids are kept. Topics that had invalid ids (or no articles, when
+    require_articles) go to a small follow-up prompt listing only the still
+    unassigned headlines. Topics still empty after MAX_UUID_VALIDATION_ATTEMPTS
+    rounds are dropped when require_articles.
+    """
+    full_tokens, full_seconds = last_call_cost()
+    broken = []
+    for topic in output["topics"]:
+        valid = [aid for aid in topic["articles"] if aid in headline_by_id]
+        if len(valid) < len(topic["articles"]):
+            logger.warning("Invalid id in topic %s", topic["topic"])
+            broken.append(topic)
+        elif require_articles and not valid:
+            logger.warning("Empty articles for topic %s", topic["topic"])
+            broken.append(topic)
+        topic["articles"] = valid
+
+    for _ in range(1, MAX_UUID_VALIDATION_ATTEMPTS):
+        assigned = {aid for topic in output["topics"] for aid in topic["articles"]}
+        unassigned = {aid: h for aid, h in headline_by_id.items() if aid not in assigned}
+        if not broken or not unassigned:
+            break
+        additions = _assign_to_topics([t["topic"] for t in broken], unassigned)
+        tokens, seconds = last_call_cost()
+        repair_stats.record(full_tokens, full_seconds, tokens, seconds)
+        for topic, extra in zip(broken, additions):
+            topic["articles"].extend(extra)
+        broken = [t for t in broken if require_articles and not t["articles"]]
+
+    empty_topics = [t["topic"] for t in output["topics"] if not t["articles"]]
+    if require_articles and empty_topics:
+        logger.warning(
+            "Dropping %d topic(s) with no matched articles after repair: %s",
             len(empty_topics),
-            MAX_UUID_VALIDATION_ATTEMPTS,
             empty_topics,
         )
-        output["topics"] = [
-            topic
-            for topic in output["topics"]
-            if len(topic["articles"]) > 0
-        ]
-        _map_ids_to_uuids(output, idx_to_uuid)
-        return output
+        output["topics"] = [t for t in output["topics"] if t["articles"]]
+    return output
 
-    raise RuntimeError(
-        f"Failed to generate valid article groupings after {MAX_UUID_VALIDATION_ATTEMPTS} attempts"
+
+def _assign_to_topics(topics: list[str], headline_by_id: dict[str, str]) -> list[list[str]]:
+    """Follow-up prompt: which of these headlines belong to each of these topics."""
+    ids = list(headline_by_id)
+    listing = "\n".join(
+        f"{i} | {headline}" for i, headline in enumerate(headline_by_id.values(), start=1)
     )
+    prompt = f"""
+    You are a news editor for a Hong Kong news website. Below are some topics and headlines not yet assigned to any topic. For each topic, list the ids of the headlines that report on it. An article may only be assigned to one topic. Skip headlines that fit none. Return every topic, in the order given and with its name unchanged.
+
+    Topics:
+    {topics}
+
+    Headlines, one per line as "id | headline":
+{listing}
+
+    Your output should be in JSON format. The "articles" field for each topic should be a list of id strings.
+    Schema:
+    {ArticlesByTopic.model_json_schema()}
+    """
+    logger.info("Repairing %d topic(s) against %d unassigned articles...", len(topics), len(ids))
+    output = generate_response(prompt=prompt, validation_class=ArticlesByTopic)
+
+    by_name = {t["topic"]: t["articles"] for t in output["topics"]}
+    if len(output["topics"]) == len(topics):
+        returned = [t["articles"] for t in output["topics"]]
+    else:
+        returned = [by_name.get(topic, []) for topic in topics]
+    return [
+        [ids[int(aid) - 1] for aid in articles if aid.isdigit() and 1 <= int(aid) <= len(ids)]
+        for articles in returned
+    ]
 
 
 def _map_ids_to_uuids(output: dict, idx_to_uuid: dict[str, str]) -> None:
@@ -228,7 +611,10 @@ def _map_ids_to_uuids(output: dict, idx_to_uuid: dict[str, str]) -> None:
         topic["articles"] = [idx_to_uuid[aid] for aid in topic["articles"]]
 
 
-def topic_summary(topic: str, article_text: str) -> dict:
+def topic_summary(
+    topic: str, article_text: str, on_partial: Callable[[dict], None] | None = None
+) -> dict:
+    """Summarise one topic; on_partial streams the summary JSON as it is written."""
     prompt = f"""
     You are a news editor for a Hong Kong news website. You are going to write a news summary for the topic: {topic}. You will be provided with a number of articles related to the topic, including the article headline and the article text.
 
@@ -251,7 +637,9 @@ def topic_summary(topic: str, article_text: str) -> dict:
     """
 
     logger.info("Generating summary for topic %s...", topic)
-    return generate_response(prompt=prompt, validation_class=TopicSummary)
+    return generate_response(
+        prompt=prompt, validation_class=TopicSummary, on_partial=on_partial
+    )
 
 
 def select_representative_articles(
@@ -304,8 +692,8 @@ def select_representative_articles(
     return selected[:max_links]
 
 
-def subedit_summary(topics_summary: dict) -> dict:
-    prompt = f"""
+def _subedit_prompt(summary: dict, schema: type[BaseModel]) -> str:
+    return f"""
     Please act as a news subeditor. Your goal is to edit the following news summary for consistent style and presentation, while strictly adhering to the following guidelines. It's important to maintain the original information and avoid adding any new content or rewriting the core meaning.
 
     **Style Guidelines:**
@@ -317,15 +705,94 @@ def subedit_summary(topics_summary: dict) -> dict:
     6. **Summary Length:**  Aim for each topic summary to be approximately 250-600 words. Focus on conciseness and information density within this range.
 
     **Input Summary (Markdown):**
-    {topics_summary}
+    {summary}
 
     Your output should be in JSON format.
     Schema:
-    {TopicsSummary.model_json_schema()}
+    {schema.model_json_schema()}
     """
 
+
+def subedit_summary(topics_summary: dict, per_topic: bool = False) -> dict:
+    """Subedit the digest in one call, or with per_topic one call per topic in parallel."""
+    if per_topic:
+        return _subedit_per_topic(topics_summary, _subedit_prompt, "tc")
     logger.info("Editing summary...")
-    return generate_response(prompt=prompt, validation_class=TopicsSummary)
+    return generate_response(
+        prompt=_subedit_prompt(topics_summary, TopicsSummary), validation_class=TopicsSummary
+    )
+
+
+def _subedit_per_topic(
+    topics_summary: dict,
+    make_prompt: Callable[[dict, type[BaseModel]], str],
+    lang: str,
+) -> dict:
+    """Subedit every topic concurrently, then align person titles across topics.
+
+    Each call only regenerates its own topic, so output tokens (and latency)
+    scale with the longest topic rather than the whole digest, and a failed
+    validation only retries that topic.
+    """
+    topics = topics_summary["topics"]
+    logger.info("Editing %d topics in parallel...", len(topics))
+    with ThreadPoolExecutor(max_workers=GEMINI_POOL_SIZE) as executor:
+        edited = list(executor.map(
+            lambda topic: generate_response(
+                prompt=make_prompt(topic, TopicSummary),
+                validation_class=TopicSummary,
+                lang=lang,
+            ),
+            topics,
+        ))
+    return _harmonise_person_titles({"topics": edited}, lang)
+
+
+def _harmonise_person_titles(topics_summary: dict, lang: str) -> dict:
+    """Cross-topic consistency pass: the model lists title fixes, applied locally.
+
+    The model only returns find/replace pairs, so the pass stays small
+    however long the digest is.
+    """
+    prompt = f"""
+    Please act as a news subeditor. The topics below were edited separately. Check how each person is titled across all topics (e.g. job titles, honorifics, name forms). Where the same person is titled inconsistently, choose one concise, professional form and list the exact text to replace in order to use it everywhere. Do not list anything else. Return an empty list if titles are already consistent.
+
+    **Topics:**
+    {topics_summary}
+
+    Your output should be in JSON format.
+    Schema:
+    {TitleFixes.model_json_schema()}
+    """
+    logger.info("Checking person titles across topics...")
+    fixes = generate_response(prompt=prompt, validation_class=TitleFixes, lang=lang)["fixes"]
+    replaced = 0
+    for fix in fixes:
+        if not fix["find"] or fix["find"] == fix["replace"]:
+            continue
+        for topic in topics_summary["topics"]:
+            topic["summary"], n = _replace_outside(topic["summary"], fix["find"], fix["replace"])
+            replaced += n
+    logger.info("Applied %d person title fixes (%d replacements)", len(fixes), replaced)
+    return topics_summary
+
+
+def _replace_outside(text: str, find: str, replace: str) -> tuple[str, int]:
+    """Replace occurrences of find that are not already part of an occurrence of replace.
+
+    So find="李家超", replace="行政長官李家超" leaves "行政長官李家超" alone.
+    Returns the new text and the number of replacements.
+    """
+    protected = [(m.start(), m.end()) for m in re.finditer(re.escape(replace), text)]
+    parts = []
+    last = 0
+    for m in re.finditer(re.escape(find), text):
+        if any(start <= m.start() and m.end() <= end for start, end in protected):
+            continue
+        parts += [text[last:m.start()], replace]
+        last = m.end()
+    parts.append(text[last:])
+    return "".join(parts), (len(parts) - 1) // 2
 
 
 def match_english_articles_to_topics(
@@ -350,50 +817,37 @@ def match_english_articles_to_topics(
     {ArticlesByTopic.model_json_schema()}
     """
 
-    valid_uuids = set(en_headlines.index)
-
-    for attempt in range(1, MAX_UUID_VALIDATION_ATTEMPTS + 1):
-        logger.info(
-            "Matching English articles to topics (attempt %d/%d)...",
-            attempt,
-            MAX_UUID_VALIDATION_ATTEMPTS,
-        )
-        output = generate_response(prompt=prompt, validation_class=ArticlesByTopic, lang="en")
-
-        has_valid_uuids = all(
-            uuid in valid_uuids
-            for topic in output["topics"]
-            for uuid in topic["articles"]
-        )
-        if has_valid_uuids:
-            return output
-        logger.warning("Invalid UUID in English article matching. Regenerating...")
-
-    # Return whatever we have, filtering invalid UUIDs
-    for topic in output["topics"]:
-        topic["articles"] = [u for u in topic["articles"] if u in valid_uuids]
-    return output
+    logger.info("Matching English articles to topics...")
+    output = generate_response(prompt=prompt, validation_class=ArticlesByTopic, lang="en")
+    headline_by_uuid = dict(zip(en_headlines.index, en_headlines["headline"]))
+    return _repair_assignments(output, headline_by_uuid, require_articles=False)
 
 
 def translate_digest_to_english(
-    zh_summary: dict, en_reference_texts: dict[str, str]
+    zh_summary: dict, glossary: dict[str, str], per_topic: bool = False
 ) -> dict:
-    """Translate Chinese digest to English, grounding proper nouns on English sources."""
-    reference_section = ""
-    if en_reference_texts:
-        parts = []
-        for topic, text in en_reference_texts.items():
-            parts.append(f"### {topic}\n{text[:3000]}")
-        reference_section = "\n\n".join(parts)
+    """Translate Chinese digest to English, spelling proper nouns as in glossary (zh -> en).
 
+    Only the glossary entries whose Chinese term appears in the text are put
+    in the prompt. With per_topic, each topic is translated by its own call
+    in parallel, so a failure only retries that topic.
+    """
+    if per_topic:
+        topics = zh_summary["topics"]
+        logger.info("Translating %d topics to English in parallel...", len(topics))
+        with ThreadPoolExecutor(max_workers=GEMINI_POOL_SIZE) as executor:
+            translated = list(executor.map(lambda t: translate_topic(t, glossary), topics))
+        return {"topics": translated}
+
+    digest_json = json.dumps(zh_summary, ensure_ascii=False, indent=2)
     prompt = f"""
     You are a professional translator and news editor. Translate the following Hong Kong news digest from Traditional Chinese to English.
 
     **Translation guidelines:**
     1. Maintain the same topic structure and order.
     2. For proper nouns (people, organizations, places, legislation):
-       - Use the official English spelling found in the reference English articles below.
-       - If not found in reference articles, use the Hong Kong Government's official English translation.
+       - Use the English form given in the glossary below.
+       - If not in the glossary, use the Hong Kong Government's official English translation.
        - As a last resort, use your own knowledge of standard English translations.
     3. Keep each topic summary between 150 and 400 words.
     4. Maintain a professional, journalistic tone suitable for an English-language news digest.
@@ -401,10 +855,10 @@ def translate_digest_to_english(
     6. Translate topic titles into concise English news headline style.
 
     **Chinese digest to translate:**
-    {json.dumps(zh_summary, ensure_ascii=False, indent=2)}
+    {digest_json}
 
-    **Reference English articles (use for proper noun grounding):**
-    {reference_section if reference_section else "(No English reference articles available)"}
+    **Glossary:**
+    {_glossary_section(glossary, digest_json)}
 
     Your output should be in JSON format.
     Schema:
@@ -415,9 +869,85 @@ def translate_digest_to_english(
     return generate_response(prompt=prompt, validation_class=TopicsSummary, lang="en")
 
 
-def subedit_summary_en(topics_summary: dict) -> dict:
-    """Subedit the English digest for style consistency."""
+def _glossary_section(glossary: dict[str, str], text: str) -> str:
+    """Prompt lines for the glossary entries whose Chinese term appears in text."""
+    lines = [f"- {zh}: {en}" for zh, en in glossary.items() if zh in text]
+    return "\n".join(lines) if lines else "(No glossary entries)"
+
+
+def extract_glossary(
+    en_reference_texts: dict[str, str], known: dict[str, str] | None = None
+) -> list[dict]:
+    """Proper nouns in English reference snippets, with their Chinese forms.
+
+    Only the snippets are sent, not the Chinese digest, so this can run as
+    soon as English articles are matched to topics. Names already in known
+    (zh -> en) are not asked for again. Returns entries with zh, en and
+    source keys, source being the outlet the spelling was taken from.
+    """
+    known_section = "\n".join(f"- {en}" for en in known.values()) if known else "(None)"
+    prompt = f"""
+    You are a professional translator preparing a glossary for translating a Hong Kong news digest from Traditional Chinese to English.
+
+    Below are English news articles grouped by topic, one per line as "outlet | headline | summary". List the proper nouns they mention (people, organizations, places, legislation) that a Chinese-language Hong Kong news digest would write in Chinese. For each, give the English form exactly as spelled in the articles, the standard Traditional Chinese form used by Hong Kong media and the Hong Kong Government, and the outlet of the article it was taken from as the source. Skip names already in the known list.
+
+    **Known names:**
+    {known_section}
+
+    **English articles:**
+    {_reference_section(en_reference_texts)}
+
+    Your output should be in JSON format.
+    Schema:
+    {Glossary.model_json_schema()}
+    """
+
+    logger.info("Extracting proper-noun glossary...")
+    output = generate_response(prompt=prompt, validation_class=Glossary, lang="en")
+    return [entry for entry in output["entries"] if entry["zh"] and entry["en"]]
+
+
+def _reference_section(en_reference_texts: dict[str, str]) -> str:
+    if not en_reference_texts:
+        return "(No English reference articles available)"
+    return "\n\n".join(
+        f"### {topic}\n{text[:3000]}" for topic, text in en_reference_texts.items()
+    )
+
+
+def translate_topic(zh_topic: dict, glossary: dict[str, str]) -> dict:
+    """Translate one digest topic, using glossary entries for names it mentions."""
+    topic_json = json.dumps(zh_topic, ensure_ascii=False, indent=2)
     prompt = f"""
+    You are a professional translator and news editor. Translate the following topic of a Hong Kong news digest from Traditional Chinese to English.
+
+    **Translation guidelines:**
+    1. For proper nouns (people, organizations, places, legislation):
+       - Use the English form given in the glossary below.
+       - If not in the glossary, use the Hong Kong Government's official English translation.
+       - As a last resort, use your own knowledge of standard English translations.
+    2. Keep the summary between 150 and 400 words.
+    3. Maintain a professional, journalistic tone suitable for an English-language news digest.
+    4. Do not add information not present in the Chinese summary.
+    5. Translate the topic title into concise English news headline style.
+
+    **Chinese topic to translate:**
+    {topic_json}
+
+    **Glossary:**
+    {_glossary_section(glossary, topic_json)}
+
+    Your output should be in JSON format.
+    Schema:
+    {TopicSummary.model_json_schema()}
+    """
+
+    logger.info("Translating topic %s...", zh_topic["topic"])
+    return generate_response(prompt=prompt, validation_class=TopicSummary, lang="en")
+
+
+def _subedit_prompt_en(summary: dict, schema: type[BaseModel]) -> str:
+    return f"""
     Please act as a news subeditor. Edit the following English news digest for consistent style and presentation, while strictly preserving the original information.
 
     **Style Guidelines:**
@@ -429,12 +959,21 @@ def subedit_summary_en(topics_summary: dict) -> dict:
     6. **Grammar and Flow:** Fix any awkward phrasing from translation while preserving meaning.
 
     **Input Summary:**
-    {topics_summary}
+    {summary}
 
     Your output should be in JSON format.
     Schema:
-    {TopicsSummary.model_json_schema()}
+    {schema.model_json_schema()}
     """
 
+
+def subedit_summary_en(topics_summary: dict, per_topic: bool = False) -> dict:
+    """Subedit the English digest for style consistency."""
+    if per_topic:
+        return _subedit_per_topic(topics_summary, _subedit_prompt_en, "en")
     logger.info("Editing English summary...")
-    return generate_response(prompt=prompt, validation_class=TopicsSummary, lang="en")
+    return generate_response(
+        prompt=_subedit_prompt_en(topics_summary, TopicsSummary),
+        validation_class=TopicsSummary,
+        lang="en",
+    )
@@ -0,0 +1,89 @@
+"""On-disk glossary of Chinese -> English proper nouns for digest translation.
+
+Each entry maps a Chinese term (official, court, bill, organisation) to the
+English spelling found in matched English reference articles, with the
+outlet it came from and the date it was last seen in them. Only spellings
+taken from a reference article are stored, so a guessed spelling never
+becomes permanent, and entries not seen for the TTL are evicted when the
+glossary is opened. Translation prompts then carry only the entries whose
+Chinese term appears in the text being translated, instead of the reference
+articles themselves.
+"""
+
+import json
+import logging
+from datetime import date, timedelta
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+MIN_TERM_LENGTH = 2  # single characters match too much unrelated text
+
+
+class GlossaryStore:
+    """zh term -> {"en", "source", "last_seen"}, persisted as one JSON file."""
+
+    def __init__(self, path: Path, ttl_days: int):
+        self.path = path
+        self.ttl_days = ttl_days
+        self._entries: dict[str, dict] = {}
+        if path.exists():
+            try:
+                self._entries = json.loads(path.read_text(encoding="utf-8"))
+            except (json.JSONDecodeError, OSError) as e:
+                logger.warning("Ignoring unreadable glossary %s: %s", path, e)
+        self.evict_expired()
+
+    def evict_expired(self) -> int:
+        """Delete entries unseen for ttl_days, or with no source. Returns number evicted."""
+        cutoff = (date.today() - timedelta(days=self.ttl_days)).isoformat()
+        expired = [
+            zh for zh, entry in self._entries.items()
+            if not entry.get("source") or entry.get("last_seen", "") < cutoff
+        ]
+        for zh in expired:
+            del self._entries[zh]
+        if expired:
+            logger.info("Evicted %d glossary entries", len(expired))
+        return len(expired)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def glossary(self) -> dict[str, str]:
+        """zh -> en for every stored term."""
+        return {zh: entry["en"] for zh, entry in self._entries.items()}
+
+    def mentioned(self, english_text: str) -> dict[str, str]:
+        """zh -> en for every stored term whose English form appears in english_text."""
+        return {
+            zh: entry["en"] for zh, entry in self._entries.items() if entry["en"] in english_text
+        }
+
+    def update(self, entries: list[dict], seen: date) -> int:
+        """Add or overwrite entries with zh, en and source keys. Returns number added.
+
+        Entries with no source are skipped.
+        """
+        added = 0
+        for entry in entries:
+            zh, en = entry["zh"].strip(), entry["en"].strip()
+            if len(zh) < MIN_TERM_LENGTH or not en or not entry.get("source"):
+                continue
+            added += zh not in self._entries
+            self._entries[zh] = {
+                "en": en,
+                "source": entry["source"],
+                "last_seen": seen.isoformat(),
+            }
+        return added
+
+    def mark_seen(self, terms: list[str], seen: date) -> None:
+        for zh in terms:
+            if zh in self._entries:
+                self._entries[zh]["last_seen"] = seen.isoformat()
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = json.dumps(self._entries, ensure_ascii=False, indent=2, sort_keys=True)
+        self.path.write_text(data, encoding="utf-8")
@@ -3,12 +3,16 @@ import json
 import logging
 import os
 import sys
+import threading
+import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
 from pathlib import Path
 from datetime import datetime
 
 import dotenv
 import pandas as pd
+from pydantic import BaseModel
 
 import gemini
 from gemini import MODEL
@@ -16,20 +20,35 @@ from utils import (
     generate_article_text,
     generate_article_links,
     generate_english_article_links,
+    deduplicate_articles_by_cluster,
     deduplicate_articles_by_url,
     append_summary_and_links,
     append_summary_and_links_en,
     extract_news_data,
 )
 from substack_api import publish_substack_post, verify_auth, SubstackAuthError
+from pipeline import Stage, run_stages
+from article_store import ArticleStore, DATA_DIR, normalise_published
+from response_cache import ResponseCache
+from glossary_store import GlossaryStore
+from similarity import cluster_articles, expand_clusters, select_diverse_articles
+from response_model import (
+    is_valid_response,
+    ArticlesByTopic,
+    TopicLink,
+    TopicsSummary,
+)
 
 dotenv.load_dotenv()
 
 logger = logging.getLogger(__name__)
 
 TEMP_DIR = Path("temp")
-DATA_DIR = Path("data")
-ARTICLES_PATH = DATA_DIR / "articles.jsonl"
+RESPONSE_CACHE_DIR = DATA_DIR / "response_cache"
+RESPONSE_CACHE_TTL_DAYS = 7
+RESPONSE_CACHE_MAX_MB = 200
+GLOSSARY_PATH = DATA_DIR / "glossary.json"
+GLOSSARY_TTL_DAYS = 180
 
 # List of RSS feed URLs
 RSS_FEEDS: dict[str, str] = {
@@ -47,6 +66,8 @@ ENGLISH_SOURCES = {"SCMP", "HKFP"}
 
 NUMBER_OF_TOPICS = 5
 MAX_LINKS_PER_TOPIC = 5
+# Below this similarity.select_diverse_articles score, links are picked by Gemini instead
+LINK_DIVERSITY_THRESHOLD = 0.6
 
 
 def _save_json(path: Path, data: object) -> None:
@@ -54,73 +75,199 @@ def _save_json(path: Path, data: object) -> None:
         json.dump(data, f, ensure_ascii=False, indent=4)
 
 
+def _load_json(path: Path, model_class: type[BaseModel] | None = None) -> object | None:
+    """Checkpoint saved by _save_json, or None if missing, unreadable or invalid."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if model_class is not None and not (
+        isinstance(data, dict) and is_valid_response(data, model_class)
+    ):
+        logger.warning("Ignoring invalid checkpoint %s", path)
+        return None
+    return data
+
+
+def _load_topic_links(path: Path) -> list | None:
+    data = _load_json(path)
+    if not isinstance(data, list) or not all(
+        isinstance(t, dict) and is_valid_response(t, TopicLink) for t in data
+    ):
+        return None
+    return data
+
+
+def _articles_known(articles_by_topic: dict, index: pd.Index) -> bool:
+    """Whether every article a checkpoint refers to is still in the loaded window."""
+    return all(u in index for t in articles_by_topic["topics"] for u in t["articles"])
+
+
 def load_articles(
     rss_feeds: dict[str, str],
     english_sources: set[str] | None = None,
 ) -> pd.DataFrame:
-    """Load articles from accumulated JSONL, falling back to fresh RSS fetch."""
+    """Load the last week's articles from the store, falling back to fresh RSS fetch."""
     TEMP_DIR.mkdir(exist_ok=True)
+    store = ArticleStore()
+    start = time.perf_counter()
 
-    if ARTICLES_PATH.exists():
-        logger.info("Reading accumulated articles from %s", ARTICLES_PATH)
-        df = pd.read_json(ARTICLES_PATH, lines=True)
+    today = pd.Timestamp.today()
+    week_ago = pd.Timestamp(today - pd.Timedelta(days=7)).tz_localize("UTC")
+
+    if store.exists():
+        logger.info("Reading accumulated articles from %s", store.articles_dir)
+        # Articles are fetched after they are published, so segments fetched
+        # before the window cannot hold anything published inside it
+        df = store.load_frame(
+            since=week_ago.to_pydatetime(), published_after=week_ago.to_pydatetime()
+        )
         # Backfill language field for older articles without it
         if "language" not in df.columns:
             df["language"] = "zh"
     else:
-        logger.info("No JSONL found, fetching fresh from RSS")
+        logger.info("No stored articles found, fetching fresh from RSS")
         news_data = extract_news_data(rss_feeds, english_sources=english_sources)
         df = pd.DataFrame(news_data)
-        # Write JSONL for future use
-        DATA_DIR.mkdir(exist_ok=True)
-        with open(ARTICLES_PATH, "w", encoding="utf-8") as f:
-            for item in news_data:
-                f.write(json.dumps(item, ensure_ascii=False) + "\n")
-
-    # Save CSV for debugging
-    csv_filepath = TEMP_DIR / "news_data.csv"
-    df.to_csv(csv_filepath, index=False)
+        # Store for future use
+        store.append(news_data)
 
     df.set_index("uuid", inplace=True)
-    df.published = pd.to_datetime(df.published, utc=True, format="mixed")
-    today = pd.Timestamp.today()
-    week_ago = pd.Timestamp(today - pd.Timedelta(days=7)).tz_localize("UTC")
+    # No-op for snapshot reads, which already hold parsed UTC timestamps
+    df.published = normalise_published(df)
     df = df[df.published > week_ago]
 
+    # Save CSV for debugging
+    csv_filepath = TEMP_DIR / "news_data.csv"
+    df.to_csv(csv_filepath)
+
     # Drop fetched_at if present — downstream doesn't need it
     if "fetched_at" in df.columns:
         df = df.drop(columns=["fetched_at"])
 
+    logger.info("Loaded %d articles in %.2fs", len(df), time.perf_counter() - start)
     return df
 
 
-def _process_topic(topic_name: str, articles: list[str], df: pd.DataFrame) -> tuple[dict, dict]:
+class DigestPreview:
+    """Markdown preview of the digest, re-rendered as topic summaries stream in."""
+
+    def __init__(self, topic_names: list[str], path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._topic_names = topic_names
+        self._summaries: list[dict | None] = [None] * len(topic_names)
+        self._links = [""] * len(topic_names)
+        self._first_output_logged = False
+
+    def update(self, idx: int, summary: dict | None = None, link: str | None = None) -> None:
+        with self._lock:
+            if summary is not None:
+                self._summaries[idx] = summary
+            if link is not None:
+                self._links[idx] = link
+                if not self._first_output_logged:
+                    self._first_output_logged = True
+                    logger.info(
+                        "First topic ready after %.1fs, preview in %s",
+                        time.perf_counter() - self._start, self.path,
+                    )
+            shown = [i for i, s in enumerate(self._summaries) if s is not None]
+            formatted = {
+                "topics": [
+                    {
+                        "topic": self._summaries[i].get("topic") or self._topic_names[i],
+                        "summary": self._summaries[i].get("summary", ""),
+                    }
+                    for i in shown
+                ]
+            }
+            text = append_summary_and_links(formatted, [{"link": self._links[i]} for i in shown])
+            self.path.write_text(text)
+
+
+def _select_links(
+    topic_name: str, articles: list[str], df: pd.DataFrame, local_links: bool
+) -> list[str]:
+    """Pick a topic's links locally if asked and diverse enough, else with Gemini."""
+    if local_links:
+        selected, diversity = select_diverse_articles(articles, df, MAX_LINKS_PER_TOPIC)
+        if diversity >= LINK_DIVERSITY_THRESHOLD:
+            return selected
+        logger.info(
+            "Local link selection for %s scored %.2f diversity, asking Gemini",
+            topic_name, diversity,
+        )
+    return gemini.select_representative_articles(topic_name, articles, df, MAX_LINKS_PER_TOPIC)
+
+
+def _process_topic(
+    topic_name: str,
+    articles: list[str],
+    df: pd.DataFrame,
+    local_links: bool = False,
+    preview: DigestPreview | None = None,
+    idx: int = 0,
+) -> tuple[dict, dict]:
     """Process a single topic: generate summary and select representative links."""
-    articles_text = generate_article_text(articles, df)
-    summary = gemini.topic_summary(topic_name, articles_text)
-    unique_articles = deduplicate_articles_by_url(articles, df)
-    selected = gemini.select_representative_articles(
-        topic_name, unique_articles, df, MAX_LINKS_PER_TOPIC
-    )
+    # Reposts of the same text add nothing to the summary or the link list
+    distinct_articles = deduplicate_articles_by_cluster(articles, df)
+    articles_text = generate_article_text(distinct_articles, df)
+    on_partial = partial(preview.update, idx) if preview is not None else None
+    summary = gemini.topic_summary(topic_name, articles_text, on_partial=on_partial)
+    unique_articles = deduplicate_articles_by_url(distinct_articles, df)
+    selected = _select_links(topic_name, unique_articles, df, local_links)
     links = generate_article_links(selected, df)
+    if preview is not None:
+        preview.update(idx, summary=summary, link=links)
     return summary, {"topic": {"topic": topic_name, "articles": articles}, "link": links}
 
 
-def generate_digest(df: pd.DataFrame, n_topics: int) -> tuple[str, str, dict, list]:
-    """Run topic generation -> summary -> subedit pipeline, return markdown + intermediates."""
-    topics = gemini.generate_topics(df[["headline", "summary"]], n_topics)
-    articles_grouped_by_topic = gemini.generate_articles_list_by_topic(
-        topics, df[["headline", "summary"]]
-    )
+def generate_topic_groups(
+    df: pd.DataFrame, n_topics: int, run_dir: Path, precluster: bool = True
+) -> dict:
+    """Identify the top topics and group article UUIDs under them.
+
+    With precluster, near-duplicate coverage is collapsed locally first and
+    only one representative per story is sent to Gemini; each representative
+    is expanded back to its whole cluster afterwards.
+    """
+    articles = df[["headline", "summary"]]
+    clusters = None
+    if precluster:
+        clusters = cluster_articles(articles)
+        articles = articles.loc[list(clusters)].assign(
+            reports=[len(members) for members in clusters.values()]
+        )
+
+    topics = gemini.generate_topics(articles, n_topics)
+    articles_grouped_by_topic = gemini.generate_articles_list_by_topic(topics, articles)
+    if clusters is not None:
+        articles_grouped_by_topic = expand_clusters(articles_grouped_by_topic, clusters)
+
+    _save_json(run_dir / "01-topics.json", topics)
+    _save_json(run_dir / "02-articles_by_topic.json", articles_grouped_by_topic)
 
-    _save_json(TEMP_DIR / "01-topics.json", topics)
-    _save_json(TEMP_DIR / "02-articles_by_topic.json", articles_grouped_by_topic)
+    return articles_grouped_by_topic
 
+
+def summarise_topics(
+    articles_grouped_by_topic: dict, df: pd.DataFrame, run_dir: Path, local_links: bool = False
+) -> tuple[dict, list]:
+    """Summarise every topic and pick its links, in parallel.
+
+    Summaries are streamed into run_dir/summary_preview.md as they are written.
+    """
     topics = articles_grouped_by_topic["topics"]
+    preview = DigestPreview([t["topic"] for t in topics], run_dir / "summary_preview.md")
 
     with ThreadPoolExecutor() as executor:
         futures = {
-            executor.submit(_process_topic, t["topic"], t["articles"], df): i
+            executor.submit(
+                _process_topic, t["topic"], t["articles"], df, local_links, preview, i
+            ): i
             for i, t in enumerate(topics)
         }
         results = [None] * len(topics)
@@ -131,52 +278,112 @@ def generate_digest(df: pd.DataFrame, n_topics: int) -> tuple[str, str, dict, li
     topics_summary = {"topics": [r[0] for r in results]}
     topics_link = [r[1] for r in results]
 
-    formatted_summary = gemini.subedit_summary(topics_summary)
+    _save_json(run_dir / "04-topics_link.json", topics_link)
+    _save_json(run_dir / "05-topics_summary_pre_edit.json", topics_summary)
+
+    return topics_summary, topics_link
+
 
-    _save_json(TEMP_DIR / "03-topics_summary.json", formatted_summary)
-    _save_json(TEMP_DIR / "04-topics_link.json", topics_link)
+def subedit_digest(
+    topics_summary: dict, topics_link: list, run_dir: Path, per_topic: bool = False
+) -> tuple[str, str, dict]:
+    """Subedit the summaries, return edited markdown, pre-edit markdown and the edited summary."""
+    formatted_summary = gemini.subedit_summary(topics_summary, per_topic=per_topic)
+    _save_json(run_dir / "03-topics_summary.json", formatted_summary)
+    return _render_digest(topics_summary, topics_link, formatted_summary, run_dir)
 
+
+def _render_digest(
+    topics_summary: dict, topics_link: list, formatted_summary: dict, run_dir: Path
+) -> tuple[str, str, dict]:
     pre_edited_text = append_summary_and_links(topics_summary, topics_link)
     edited_text = append_summary_and_links(formatted_summary, topics_link)
 
-    return edited_text, pre_edited_text, formatted_summary, topics_link
+    (run_dir / "summary_pre_edited.md").write_text(pre_edited_text)
+    (run_dir / "summary_edited.md").write_text(edited_text)
 
+    return edited_text, pre_edited_text, formatted_summary
 
-def generate_english_digest(
-    formatted_summary_zh: dict,
-    topics_link_zh: list[dict],
-    df: pd.DataFrame,
-) -> str:
-    """Translate Chinese digest to English, grounding proper nouns on English sources."""
+
+def match_english_articles(topic_names: list[str], df: pd.DataFrame, run_dir: Path) -> dict:
+    """Match English articles to the Chinese digest's topics, by topic index."""
     df_en = df[df["language"] == "en"] if "language" in df.columns else pd.DataFrame()
 
-    # Match English articles to the same topics
-    if not df_en.empty:
-        topic_names = [t["topic"] for t in formatted_summary_zh["topics"]]
+    if df_en.empty:
+        en_matched = {"topics": [{"topic": name, "articles": []} for name in topic_names]}
+    else:
         en_matched = gemini.match_english_articles_to_topics(
             topic_names, df_en[["headline", "summary"]]
         )
-        _save_json(TEMP_DIR / "07-en_articles_by_topic.json", en_matched)
-    else:
-        en_matched = {"topics": [{"topic": t["topic"], "articles": []} for t in formatted_summary_zh["topics"]]}
+    _save_json(run_dir / "07-en_articles_by_topic.json", en_matched)
+    return en_matched
 
-    # Build English reference text per topic for grounding (index-based)
-    en_articles_by_index: list[list[str]] = [t["articles"] for t in en_matched["topics"]]
 
-    # Translate digest to English
-    en_reference_texts = {}
-    for i, uuids in enumerate(en_articles_by_index):
-        valid_uuids = [u for u in uuids if u in df.index]
+def build_english_glossary(en_matched: dict, df: pd.DataFrame, run_dir: Path) -> dict[str, str]:
+    """zh -> en proper nouns: the persistent glossary, topped up from this run's matched English articles.
+
+    Reads only outlet, headline and summary of the matched articles, not the
+    Chinese digest, so it can run while the digest is still being written.
+    """
+    snippets = {}
+    outlets = set()
+    for t in en_matched["topics"]:
+        valid_uuids = [u for u in t["articles"] if u in df.index]
         if valid_uuids:
-            topic_name = formatted_summary_zh["topics"][i]["topic"]
-            en_reference_texts[topic_name] = generate_article_text(valid_uuids, df)
+            rows = df.loc[valid_uuids]
+            snippets[t["topic"]] = "\n".join(
+                f"{row.source} | {row.headline} | {row.summary}" for row in rows.itertuples()
+            )
+            outlets.update(rows["source"])
+
+    store = GlossaryStore(GLOSSARY_PATH, GLOSSARY_TTL_DAYS)
+    known = store.mentioned("\n".join(snippets.values()))
+    today = datetime.now().date()
+    store.mark_seen(list(known), today)
+    unsourced = {}
+    if snippets:
+        entries = gemini.extract_glossary(snippets, known)
+        sourced = [e for e in entries if e["source"] in outlets]
+        # Guessed spellings are used for this run only, never stored, so a
+        # later sourced spelling is not skipped as already known
+        unsourced = {e["zh"]: e["en"] for e in entries if e["source"] not in outlets}
+        added = store.update(sourced, today)
+        logger.info(
+            "Glossary: %d known terms in English coverage, %d added, %d unsourced (%d stored)",
+            len(known), added, len(unsourced), len(store),
+        )
+    store.save()
+
+    glossary = unsourced | store.glossary()
+    _save_json(run_dir / "07-en_glossary.json", glossary)
+    return glossary
+
+
+def translate_english_digest(
+    formatted_summary_zh: dict,
+    glossary: dict[str, str],
+    run_dir: Path,
+    per_topic: bool = False,
+) -> dict:
+    """Translate Chinese digest to English, spelling proper nouns as in glossary."""
+    translated = gemini.translate_digest_to_english(formatted_summary_zh, glossary, per_topic)
+    _save_json(run_dir / "08-en_translated.json", translated)
+    return translated
 
-    translated = gemini.translate_digest_to_english(formatted_summary_zh, en_reference_texts)
-    _save_json(TEMP_DIR / "08-en_translated.json", translated)
 
-    # Subedit English version
-    edited_en = gemini.subedit_summary_en(translated)
-    _save_json(TEMP_DIR / "09-en_subedited.json", edited_en)
+def generate_english_digest(
+    translated: dict,
+    topics_link_zh: list[dict],
+    en_matched: dict,
+    df: pd.DataFrame,
+    run_dir: Path,
+    per_topic_subedit: bool = False,
+) -> str:
+    """Subedit the translated digest and attach English-first links."""
+    edited_en = gemini.subedit_summary_en(translated, per_topic=per_topic_subedit)
+    _save_json(run_dir / "09-en_subedited.json", edited_en)
+
+    en_articles_by_index: list[list[str]] = [t["articles"] for t in en_matched["topics"]]
 
     # Build English links per topic (index-based to avoid name mismatch)
     en_topics_link = []
@@ -189,15 +396,216 @@ def generate_english_digest(
         links = generate_english_article_links(valid_zh, valid_en, df)
         en_topics_link.append({"topic": {"topic": topic_name, "articles": en_uuids}, "link": links})
 
-    _save_json(TEMP_DIR / "10-en_topics_link.json", en_topics_link)
+    _save_json(run_dir / "10-en_topics_link.json", en_topics_link)
+    return _render_english_digest(edited_en, en_topics_link, run_dir)
+
 
-    return append_summary_and_links_en(edited_en, en_topics_link)
+def _render_english_digest(edited_en: dict, en_topics_link: list, run_dir: Path) -> str:
+    en_text = append_summary_and_links_en(edited_en, en_topics_link)
+    (run_dir / "summary_en.md").write_text(en_text)
+    return en_text
 
 
-def run_pipeline(draft_only: bool = False) -> None:
-    """Main entry point: load articles, generate digest, publish."""
+def build_stages(
+    df: pd.DataFrame,
+    df_zh: pd.DataFrame,
+    draft_only: bool,
+    zh_url: str | None,
+    en_url: str | None,
+    run_dir: Path,
+    precluster: bool = True,
+    local_links: bool = False,
+    parallel_subedit: bool = False,
+    parallel_translate: bool = False,
+) -> list[Stage]:
+    """Digest pipeline as a stage graph.
+
+    Declaration order is the sequential run order, which publishes the
+    Chinese digest before any English work starts. Every stage checkpoints
+    its result in run_dir and can restore it from there on --resume.
+    """
+    earliest = df_zh.published.min()
+    latest = df_zh.published.max()
+    now = datetime.now()
+
+    def mark_published(name: str) -> dict:
+        marker = {"published_at": datetime.now().isoformat(), "draft_only": draft_only}
+        _save_json(run_dir / name, marker)
+        return marker
+
+    def restore_published(name: str) -> dict | None:
+        marker = _load_json(run_dir / name)
+        if isinstance(marker, dict) and marker.get("draft_only") == draft_only:
+            return marker
+        return None
+
+    def restore_topic_groups() -> dict | None:
+        groups = _load_json(run_dir / "02-articles_by_topic.json", ArticlesByTopic)
+        if groups is None or not _articles_known(groups, df_zh.index):
+            return None
+        return groups
+
+    def restore_topic_results() -> tuple[dict, list] | None:
+        topics_summary = _load_json(run_dir / "05-topics_summary_pre_edit.json", TopicsSummary)
+        topics_link = _load_topic_links(run_dir / "04-topics_link.json")
+        if topics_summary is None or topics_link is None:
+            return None
+        return topics_summary, topics_link
+
+    def restore_digest() -> tuple[str, str, dict] | None:
+        results = restore_topic_results()
+        formatted_summary = _load_json(run_dir / "03-topics_summary.json", TopicsSummary)
+        if results is None or formatted_summary is None:
+            return None
+        return _render_digest(*results, formatted_summary, run_dir)
+
+    def restore_en_matched() -> dict | None:
+        en_matched = _load_json(run_dir / "07-en_articles_by_topic.json", ArticlesByTopic)
+        if en_matched is None or not _articles_known(en_matched, df.index):
+            return None
+        return en_matched
+
+    def restore_en_digest() -> str | None:
+        edited_en = _load_json(run_dir / "09-en_subedited.json", TopicsSummary)
+        en_topics_link = _load_topic_links(run_dir / "10-en_topics_link.json")
+        if edited_en is None or en_topics_link is None:
+            return None
+        return _render_english_digest(edited_en, en_topics_link, run_dir)
+
+    def already_published(name: str) -> dict | None:
+        # Checked even when upstream stages had to re-run on --resume, so a
+        # digest is never posted twice
+        marker = restore_published(name)
+        if marker is not None:
+            logger.info("%s exists, not publishing again", run_dir / name)
+        return marker
+
+    def publish_zh(digest: tuple[str, str, dict]) -> dict:
+        if marker := already_published("06-published.json"):
+            return marker
+        publish_substack_post(
+            title=f"{now.year}年{now.month}月{now.day}日 香港每週新聞摘要",
+            subtitle=f"本期涵蓋 {earliest.month}月{earliest.day}日 至 {latest.month}月{latest.day}日 的新聞。本新聞摘要由 {MODEL} 自動生成。",
+            content=digest[0],
+            draft_only=draft_only,
+            publication_url=zh_url,
+        )
+        return mark_published("06-published.json")
+
+    def publish_en(en_digest: str) -> dict:
+        if marker := already_published("11-en_published.json"):
+            return marker
+        publish_substack_post(
+            title=f"Hong Kong Weekly News Digest — {now.strftime('%B %d, %Y')}",
+            subtitle=f"Covering news from {earliest.strftime('%B %d')} to {latest.strftime('%B %d')}. Auto-generated by {MODEL}.",
+            content=en_digest,
+            draft_only=draft_only,
+            publication_url=en_url,
+        )
+        return mark_published("11-en_published.json")
+
+    stages = [
+        Stage(
+            "topic_groups",
+            lambda: generate_topic_groups(df_zh, NUMBER_OF_TOPICS, run_dir, precluster),
+            restore=restore_topic_groups,
+        ),
+        Stage(
+            "topic_results",
+            lambda topic_groups: summarise_topics(topic_groups, df_zh, run_dir, local_links),
+            ("topic_groups",),
+            restore=restore_topic_results,
+        ),
+        Stage(
+            "digest",
+            lambda topic_results: subedit_digest(*topic_results, run_dir, parallel_subedit),
+            ("topic_results",),
+            restore=restore_digest,
+        ),
+        Stage(
+            "publish",
+            publish_zh,
+            ("digest",),
+            restore=lambda: restore_published("06-published.json"),
+        ),
+    ]
+    if en_url:
+        stages += [
+            # Only needs the topic names, so it can overlap the Chinese summaries
+            Stage(
+                "en_matched",
+                lambda topic_groups: match_english_articles(
+                    [t["topic"] for t in topic_groups["topics"]], df, run_dir
+                ),
+                ("topic_groups",),
+                restore=restore_en_matched,
+            ),
+            # Only needs the English articles, so it can also overlap the Chinese digest
+            Stage(
+                "en_glossary",
+                lambda en_matched: build_english_glossary(en_matched, df, run_dir),
+                ("en_matched",),
+                restore=lambda: _load_json(run_dir / "07-en_glossary.json"),
+            ),
+            Stage(
+                "en_translated",
+                lambda digest, en_glossary: translate_english_digest(
+                    digest[2], en_glossary, run_dir, parallel_translate
+                ),
+                ("digest", "en_glossary"),
+                restore=lambda: _load_json(run_dir / "08-en_translated.json", TopicsSummary),
+            ),
+            Stage(
+                "en_digest",
+                lambda en_translated, topic_results, en_matched: generate_english_digest(
+                    en_translated, topic_results[1], en_matched, df, run_dir, parallel_subedit
+                ),
+                ("en_translated", "topic_results", "en_matched"),
+                restore=restore_en_digest,
+            ),
+            # The English post never goes out without the Chinese one
+            Stage(
+                "publish_en",
+                lambda en_digest, publish: publish_en(en_digest),
+                ("en_digest", "publish"),
+                restore=lambda: restore_published("11-en_published.json"),
+            ),
+        ]
+    return stages
+
+
+def run_pipeline(
+    draft_only: bool = False,
+    concurrent: bool = False,
+    use_cache: bool = False,
+    resume_run_id: str | None = None,
+    precluster: bool = True,
+    local_links: bool = False,
+    parallel_subedit: bool = False,
+    parallel_translate: bool = False,
+) -> None:
+    """Main entry point: load articles, generate digest, publish.
+
+    Stage artifacts go to temp/<run-id>/. With resume_run_id, stages whose
+    artifacts in that run's directory are present and valid are skipped.
+    """
     logging.basicConfig(level=logging.INFO)
 
+    run_id = resume_run_id or datetime.now().strftime("%Y%m%d-%H%M%S")
+    run_dir = TEMP_DIR / run_id
+    if resume_run_id is not None and not run_dir.is_dir():
+        print(f"ERROR: no run {resume_run_id} to resume in {TEMP_DIR}", file=sys.stderr)
+        sys.exit(2)
+    run_dir.mkdir(parents=True, exist_ok=True)
+    logger.info("Run id %s, artifacts in %s", run_id, run_dir)
+
+    response_cache = None
+    if use_cache:
+        response_cache = ResponseCache(
+            RESPONSE_CACHE_DIR, RESPONSE_CACHE_TTL_DAYS, RESPONSE_CACHE_MAX_MB * 1024 * 1024
+        )
+        gemini.set_response_cache(response_cache)
+
     zh_url = os.environ.get("SUBSTACK_URL")
     en_url = os.environ.get("SUBSTACK_EN_URL")
 
@@ -215,44 +623,41 @@ def run_pipeline(draft_only: bool = False) -> None:
             )
             sys.exit(2)
 
-    df = load_articles(RSS_FEEDS, english_sources=ENGLISH_SOURCES)
+    # The loaded articles are saved with the run, so a resumed run sees the
+    # same window its checkpoints were made from
+    articles_path = run_dir / "00-articles.parquet"
+    if resume_run_id is not None and articles_path.exists():
+        logger.info("Reading the run's articles from %s", articles_path)
+        df = pd.read_parquet(articles_path)
+    else:
+        df = load_articles(RSS_FEEDS, english_sources=ENGLISH_SOURCES)
+        df.to_parquet(articles_path)
 
     # Filter to Chinese-only articles for the Chinese digest pipeline
     df_zh = df[df["language"] == "zh"] if "language" in df.columns else df
 
-    edited_text, pre_edited_text, formatted_summary, topics_link = generate_digest(
-        df_zh, NUMBER_OF_TOPICS
-    )
-
-    (TEMP_DIR / "summary_pre_edited.md").write_text(pre_edited_text)
-    (TEMP_DIR / "summary_edited.md").write_text(edited_text)
-
-    earliest = df_zh.published.min()
-    latest = df_zh.published.max()
-    now = datetime.now()
-
-    # Publish Chinese digest
-    publish_substack_post(
-        title=f"{now.year}年{now.month}月{now.day}日 香港每週新聞摘要",
-        subtitle=f"本期涵蓋 {earliest.month}月{earliest.day}日 至 {latest.month}月{latest.day}日 的新聞。本新聞摘要由 {MODEL} 自動生成。",
-        content=edited_text,
-        draft_only=draft_only,
-        publication_url=zh_url,
-    )
-
-    # Generate and publish English digest
-    if en_url:
-        logger.info("Generating English digest...")
-        en_text = generate_english_digest(formatted_summary, topics_link, df)
-        (TEMP_DIR / "summary_en.md").write_text(en_text)
-
-        publish_substack_post(
-            title=f"Hong Kong Weekly News Digest — {now.strftime('%B %d, %Y')}",
-            subtitle=f"Covering news from {earliest.strftime('%B %d')} to {latest.strftime('%B %d')}. Auto-generated by {MODEL}.",
-            content=en_text,
-            draft_only=draft_only,
-            publication_url=en_url,
+    try:
+        run_stages(
+            build_stages(
+                df, df_zh, draft_only, zh_url, en_url, run_dir,
+                precluster, local_links, parallel_subedit, parallel_translate,
+            ),
+            concurrent=concurrent,
+            resume=resume_run_id is not None,
         )
+    finally:
+        if gemini.repair_stats.repairs:
+            logger.info(
+                "Partial repairs: %d, saving ~%d tokens and %.0fs over full regeneration",
+                gemini.repair_stats.repairs,
+                gemini.repair_stats.tokens_saved,
+                gemini.repair_stats.seconds_saved,
+            )
+        if response_cache is not None:
+            logger.info(
+                "Response cache: %d hits, %d misses",
+                response_cache.hits, response_cache.misses,
+            )
 
 
 if __name__ == "__main__":
@@ -262,5 +667,51 @@ if __name__ == "__main__":
         action="store_true",
         help="Create a Substack draft without publishing or emailing",
     )
+    parser.add_argument(
+        "--concurrent",
+        action="store_true",
+        help="Run independent pipeline stages concurrently instead of one after another",
+    )
+    parser.add_argument(
+        "--cache",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help="Reuse cached Gemini responses for identical prompts (default: off)",
+    )
+    parser.add_argument(
+        "--resume",
+        metavar="RUN_ID",
+        help="Resume a previous run from its stage artifacts in temp/RUN_ID/",
+    )
+    parser.add_argument(
+        "--precluster",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Collapse near-duplicate articles locally before topic grouping (default: on)",
+    )
+    parser.add_argument(
+        "--local-links",
+        action="store_true",
+        help="Pick topic links locally (source round-robin + MMR), asking Gemini only when too uniform",
+    )
+    parser.add_argument(
+        "--parallel-subedit",
+        action="store_true",
+        help="Subedit each topic in its own parallel call, then align person titles across topics",
+    )
+    parser.add_argument(
+        "--parallel-translate",
+        action="store_true",
+        help="Translate each topic of the English digest in its own parallel call",
+    )
     args = parser.parse_args()
-    run_pipeline(draft_only=args.draft)
+    run_pipeline(
+        draft_only=args.draft,
+        concurrent=args.concurrent,
+        use_cache=args.cache,
+        resume_run_id=args.resume,
+        precluster=args.precluster,
+        local_links=args.local_links,
+        parallel_subedit=args.parallel_subedit,
+        parallel_translate=args.parallel_translate,
+    )
@@ -0,0 +1,127 @@
+"""Dependency-graph runner for the digest pipeline stages.
+
+Each stage names the stages whose results it needs. Stages run either one
+after another in declaration order, or concurrently on an asyncio event loop
+where every stage starts as soon as its dependencies have finished and a
+failure only skips the stages downstream of it. Stage bodies are ordinary
+blocking functions (Gemini calls through the shared pooled client), so in
+concurrent mode they run in worker threads.
+
+A stage may also know how to restore its result from a checkpoint written by
+an earlier run. When resuming, such a stage is skipped if its checkpoint is
+usable and none of its dependencies had to be re-run.
+"""
+
+import asyncio
+import logging
+import time
+from collections.abc import Callable
+
+logger = logging.getLogger(__name__)
+
+
+class Stage:
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[..., object],
+        deps: tuple[str, ...] = (),
+        restore: Callable[[], object | None] | None = None,
+    ):
+        self.name = name
+        self.fn = fn
+        self.deps = deps
+        # Returns the checkpointed result, or None if missing or invalid
+        self.restore = restore
+
+
+def run_stages(
+    stages: list[Stage], concurrent: bool = False, resume: bool = False
+) -> dict[str, object]:
+    """Run stages and return their results keyed by stage name.
+
+    Dependencies must be declared before the stages that use them. Each stage
+    function is called with its dependencies' results as keyword arguments.
+    With resume, checkpointed stages are restored instead of run. Per-stage
+    and end-to-end wall times are logged at the end.
+    """
+    seen: set[str] = set()
+    for stage in stages:
+        missing = set(stage.deps) - seen
+        if missing:
+            raise ValueError(
+                f"Stage {stage.name} depends on stages not declared before it: {sorted(missing)}"
+            )
+        seen.add(stage.name)
+
+    timings: dict[str, tuple[float, float]] = {}
+    start = time.perf_counter()
+    results = _restore_checkpoints(stages) if resume else {}
+    pending = [stage for stage in stages if stage.name not in results]
+    if concurrent:
+        asyncio.run(_run_concurrent(pending, results, timings, start))
+    else:
+        for stage in pending:
+            results[stage.name] = _run_stage(stage, results, timings, start)
+    _log_timings(timings, time.perf_counter() - start)
+    return results
+
+
+def _restore_checkpoints(stages: list[Stage]) -> dict[str, object]:
+    """Results of the stages that can be restored rather than re-run."""
+    results: dict[str, object] = {}
+    for stage in stages:
+        if stage.restore is None or any(dep not in results for dep in stage.deps):
+            continue
+        result = stage.restore()
+        if result is None:
+            logger.info("Stage %s has no usable checkpoint, will run", stage.name)
+            continue
+        results[stage.name] = result
+        logger.info("Stage %s restored from checkpoint", stage.name)
+    return results
+
+
+def _run_stage(
+    stage: Stage,
+    results: dict[str, object],
+    timings: dict[str, tuple[float, float]],
+    start: float,
+) -> object:
+    stage_start = time.perf_counter()
+    logger.info("Stage %s started", stage.name)
+    result = stage.fn(**{dep: results[dep] for dep in stage.deps})
+    timings[stage.name] = (stage_start - start, time.perf_counter() - stage_start)
+    return result
+
+
+async def _run_concurrent(
+    stages: list[Stage],
+    results: dict[str, object],
+    timings: dict[str, tuple[float, float]],
+    start: float,
+) -> None:
+    tasks: dict[str, asyncio.Task] = {}
+
+    async def run(stage: Stage) -> None:
+        # A failed dependency re-raises here, skipping this stage; stages that
+        # do not depend on it carry on. Restored dependencies have no task.
+        for dep in stage.deps:
+            if dep in tasks:
+                await tasks[dep]
+        results[stage.name] = await asyncio.to_thread(_run_stage, stage, results, timings, start)
+
+    for stage in stages:
+        tasks[stage.name] = asyncio.create_task(run(stage))
+    outcomes = await asyncio.gather(*tasks.values(), return_exceptions=True)
+    for outcome in outcomes:
+        if isinstance(outcome, BaseException):
+            raise outcome
+
+
+def _log_timings(timings: dict[str, tuple[float, float]], total: float) -> None:
+    lines = [f"{'stage':<20} {'start':>8} {'duration':>9}"]
+    for name, (offset, duration) in sorted(timings.items(), key=lambda item: item[1][0]):
+        lines.append(f"{name:<20} {offset:>7.1f}s {duration:>8.1f}s")
+    lines.append(f"{'total wall time':<20} {'':>8} {total:>8.1f}s")
+    logger.info("Stage timings:\n%s", "\n".join(lines))
@@ -0,0 +1,114 @@
+"""Content-addressed on-disk cache of Gemini responses.
+
+Each entry is a JSON file named by the SHA-256 of everything that determines
+the response: model, generation config, output language, full prompt and the
+validation schema. Re-running the pipeline with identical inputs (after a
+Substack failure, or while tuning one prompt) then skips every unchanged
+call. Entries older than the TTL are evicted when the cache is opened, and
+the oldest entries are evicted whenever the cache grows past its size limit.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+
+def response_key(
+    model: str,
+    config: dict,
+    lang: str,
+    prompt: str,
+    validation_class: type[BaseModel] | None,
+) -> str:
+    schema = None
+    if validation_class is not None:
+        schema = [validation_class.__qualname__, validation_class.model_json_schema()]
+    payload = json.dumps(
+        [model, config, lang, prompt, schema], sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Directory of key -> response JSON files, safe to share across threads."""
+
+    def __init__(self, directory: Path, ttl_days: float, max_bytes: int):
+        self.directory = directory
+        self.ttl_seconds = ttl_days * 86400
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        directory.mkdir(parents=True, exist_ok=True)
+        self.evict_expired()
+
+    def evict_expired(self) -> int:
+        """Delete entries older than the TTL. Returns number evicted."""
+        cutoff = time.time() - self.ttl_seconds
+        evicted = 0
+        with self._lock:
+            for path in self.directory.glob("*.json"):
+                if path.stat().st_mtime < cutoff:
+                    path.unlink(missing_ok=True)
+                    evicted += 1
+        if evicted:
+            logger.info("Evicted %d expired response cache entries", evicted)
+        return evicted
+
+    def get(self, key: str) -> dict | str | None:
+        """Cached response for key, counting the lookup as a hit or miss."""
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            with self._lock:
+                self.misses += 1
+            return None
+        if time.time() - entry["created_at"] > self.ttl_seconds:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return entry["response"]
+
+    def put(self, key: str, response: dict | str) -> None:
+        entry = {"created_at": time.time(), "response": response}
+        path = self._path(key)
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp_path.write_text(json.dumps(entry, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, path)
+        self._evict_oversize()
+
+    def _evict_oversize(self) -> None:
+        """Delete the oldest entries until the cache fits in max_bytes."""
+        with self._lock:
+            entries = []
+            for path in self.directory.glob("*.json"):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in entries)
+            if total <= self.max_bytes:
+                return
+            evicted = 0
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+                evicted += 1
+        logger.info("Evicted %d response cache entries over the size limit", evicted)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
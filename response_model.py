@@ -36,10 +36,41 @@ class SelectedArticles(BaseModel):
     selected: list[ArticleItem]
 
 
-def is_valid_response(response: dict, model_class: type[BaseModel]) -> bool:
+class TitleFix(BaseModel):
+    find: str
+    replace: str
+
+
+class TitleFixes(BaseModel):
+    fixes: list[TitleFix]
+
+
+class GlossaryEntry(BaseModel):
+    zh: str
+    en: str
+    source: str = ""
+
+
+class Glossary(BaseModel):
+    entries: list[GlossaryEntry]
+
+
+class TopicLink(BaseModel):
+    """One entry of a topics_link checkpoint (04-/10-*.json)."""
+
+    topic: ArticlesListForATopic
+    link: str
+
+
+def validation_error(response: dict, model_class: type[BaseModel]) -> str | None:
+    """Validation error message for response, or None if it is valid."""
     try:
         model_class(**response)
-        return True
+        return None
     except ValidationError as e:
         logger.warning("Validation errors: %s", e)
-        return False
+        return str(e)
+
+
+def is_valid_response(response: dict, model_class: type[BaseModel]) -> bool:
+    return validation_error(response, model_class) is None
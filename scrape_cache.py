@@ -0,0 +1,87 @@
+"""Persistent cache of scraped article bodies.
+
+Rows are keyed by URL and also record the SHA-256 of the fetched page, so a
+cache hit skips both the request and the HTML parse, and a re-fetched page
+with an already-seen body skips the parse. Rows older than the TTL are
+evicted when the cache is opened.
+"""
+
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()
+
+
+class ScrapeCache:
+    """SQLite-backed url -> markdown cache, safe to share across threads."""
+
+    def __init__(self, path: Path, ttl_days: float):
+        self.path = path
+        self.ttl_seconds = ttl_days * 86400
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS scraped (
+                url TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                markdown TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS scraped_hash ON scraped (content_hash)"
+        )
+        self.evict_expired()
+
+    def evict_expired(self) -> int:
+        """Delete rows older than the TTL. Returns number evicted."""
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock, self._conn:
+            cur = self._conn.execute("DELETE FROM scraped WHERE fetched_at < ?", (cutoff,))
+        if cur.rowcount:
+            logger.info("Evicted %d expired scrape cache entries", cur.rowcount)
+        return cur.rowcount
+
+    def get(self, url: str) -> str | None:
+        """Cached markdown for url, counting the lookup as a hit or miss."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT markdown FROM scraped WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+
+    def get_by_hash(self, digest: str) -> str | None:
+        """Markdown previously produced from a page body with this hash."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT markdown FROM scraped WHERE content_hash = ? LIMIT 1", (digest,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, url: str, digest: str, markdown: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO scraped (url, content_hash, fetched_at, markdown) "
+                "VALUES (?, ?, ?, ?)",
+                (url, digest, time.time(), markdown),
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,191 @@
+"""Local text similarity for articles, no model calls.
+
+Articles are embedded as TF-IDF vectors over character bigrams of headline
+plus summary, which works for Chinese without a tokenizer. Bigrams are
+hashed into a fixed number of buckets so the whole week fits in one small
+dense matrix. Near-duplicate coverage of the same story by several outlets
+is collapsed into clusters, so prompts can list one representative per
+story.
+
+Reposts of the same text (wire copy, outlets republishing each other) are
+found at ingest with MinHash signatures over character shingles of the
+article content, bucketed by LSH bands so only candidate pairs are compared.
+"""
+
+import logging
+import zlib
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+N_BUCKETS = 1 << 13
+CLUSTER_THRESHOLD = 0.35  # cosine similarity at or above which two articles are the same story
+
+SHINGLE_SIZE = 5
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16  # 4 rows per band: pairs above ~0.5 Jaccard nearly always share a band
+DUPLICATE_THRESHOLD = 0.7  # estimated Jaccard of content shingles for a repost
+MAX_SHINGLED_CHARS = 3000  # reposts already agree within their opening paragraphs
+
+# Multiply-shift hash family: (a * x + b) mod 2**64, top 32 bits, a odd
+_rng = np.random.default_rng(0)
+_PERM_A = _rng.integers(0, 1 << 63, MINHASH_PERMUTATIONS, dtype=np.uint64) * 2 + 1
+_PERM_B = _rng.integers(0, 1 << 63, MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+
+def _bigrams(text: str) -> list[str]:
+    text = "".join(text.split())
+    return [text[i:i + 2] for i in range(len(text) - 1)]
+
+
+def tfidf_matrix(texts: list[str]) -> np.ndarray:
+    """L2-normalised TF-IDF rows, one per text, over hashed character bigrams."""
+    counts = np.zeros((len(texts), N_BUCKETS), dtype=np.float32)
+    for row, text in enumerate(texts):
+        buckets = [zlib.crc32(b.encode("utf-8")) % N_BUCKETS for b in _bigrams(text)]
+        np.add.at(counts[row], buckets, 1)
+    doc_freq = np.count_nonzero(counts, axis=0)
+    idf = np.log((1 + len(texts)) / (1 + doc_freq)) + 1
+    tfidf = np.log1p(counts) * idf
+    norms = np.linalg.norm(tfidf, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return tfidf / norms
+
+
+def article_texts(df: pd.DataFrame) -> list[str]:
+    return (df["headline"].fillna("") + " " + df["summary"].fillna("")).tolist()
+
+
+def cluster_articles(
+    df: pd.DataFrame, threshold: float = CLUSTER_THRESHOLD
+) -> dict[str, list[str]]:
+    """Collapse near-duplicate articles into clusters.
+
+    Returns each representative's index label mapped to its cluster's labels,
+    representative first, in df order of representatives. Articles with the
+    most near-duplicates become representatives first, and every member is
+    within threshold of its representative, so clusters do not chain.
+    """
+    if df.empty:
+        return {}
+    vectors = tfidf_matrix(article_texts(df))
+    similar = (vectors @ vectors.T) >= threshold
+
+    unassigned = np.ones(len(df), dtype=bool)
+    clusters: dict[int, list[int]] = {}
+    for i in np.argsort(-similar.sum(axis=1), kind="stable"):
+        if not unassigned[i]:
+            continue
+        members = np.flatnonzero(similar[i] & unassigned)
+        unassigned[members] = False
+        clusters[i] = [i] + [j for j in members if j != i]
+
+    labels = df.index
+    logger.info(
+        "Pre-clustered %d articles into %d stories (threshold %.2f)",
+        len(df), len(clusters), threshold,
+    )
+    return {
+        labels[rep]: [labels[j] for j in members]
+        for rep, members in sorted(clusters.items())
+    }
+
+
+def expand_clusters(articles_by_topic: dict, clusters: dict[str, list[str]]) -> dict:
+    """Replace each representative in an ArticlesByTopic dict with its whole cluster."""
+    return {
+        "topics": [
+            {
+                "topic": topic["topic"],
+                "articles": [
+                    member
+                    for rep in topic["articles"]
+                    for member in clusters.get(rep, [rep])
+                ],
+            }
+            for topic in articles_by_topic["topics"]
+        ]
+    }
+
+
+def minhash_signature(text: str) -> np.ndarray | None:
+    """MinHash of text's character shingles, or None if text is too short."""
+    text = "".join(text.split())[:MAX_SHINGLED_CHARS]
+    if len(text) < SHINGLE_SIZE:
+        return None
+    shingles = {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+    hashes = np.fromiter(
+        (zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles)
+    )
+    return ((np.outer(_PERM_A, hashes) + _PERM_B[:, None]) >> np.uint64(32)).min(axis=1)
+
+
+def earliest_duplicates(signatures: list[np.ndarray | None], first_new: int = 0) -> list[int]:
+    """For each signature from first_new on, the index of the earliest near-duplicate (itself if none).
+
+    Signatures before first_new are only matched against, never with each
+    other, so a stored archive is not re-compared every day. Every member of
+    a shared LSH bucket is a candidate, not just its first.
+    """
+    rows = MINHASH_PERMUTATIONS // LSH_BANDS
+    buckets: dict[tuple[int, bytes], list[int]] = {}
+    matches = []
+    for i, sig in enumerate(signatures):
+        if sig is None:
+            if i >= first_new:
+                matches.append(i)
+            continue
+        keys = [(band, sig[band * rows:(band + 1) * rows].tobytes()) for band in range(LSH_BANDS)]
+        if i >= first_new:
+            candidates = {j for key in keys for j in buckets.get(key, ())}
+            matches.append(min(
+                (j for j in candidates if np.mean(signatures[j] == sig) >= DUPLICATE_THRESHOLD),
+                default=i,
+            ))
+        for key in keys:
+            buckets.setdefault(key, []).append(i)
+    return matches
+
+
+def select_diverse_articles(
+    articles: list[str], df: pd.DataFrame, max_links: int, relevance_weight: float = 0.5
+) -> tuple[list[str], float]:
+    """Pick up to max_links articles covering the most sources and angles.
+
+    Source round-robin: while some source is still unpicked, only its
+    articles are eligible. Among the eligible, maximal marginal relevance
+    over headline + content TF-IDF picks the article closest to the topic
+    centroid and least similar to those already picked.
+
+    Returns the picks and a diversity score in [0, 1]: the lower of the
+    share of available sources covered and one minus the mean pairwise
+    similarity of the picks.
+    """
+    if len(articles) <= 1:
+        return list(articles), 1.0
+    rows = df.loc[articles]
+    texts = (rows["headline"].fillna("") + " " + rows["content"].fillna("").str[:500]).tolist()
+    vectors = tfidf_matrix(texts)
+    similarity = vectors @ vectors.T
+    centroid = vectors.mean(axis=0)
+    relevance = vectors @ (centroid / (np.linalg.norm(centroid) or 1))
+    sources = rows["source"].tolist()
+
+    selected: list[int] = []
+    for _ in range(min(max_links, len(articles))):
+        used_sources = {sources[i] for i in selected}
+        candidates = [i for i in range(len(articles)) if i not in selected]
+        fresh = [i for i in candidates if sources[i] not in used_sources]
+        best = max(
+            fresh or candidates,
+            key=lambda i: relevance_weight * relevance[i]
+            - (1 - relevance_weight) * max((similarity[i, j] for j in selected), default=0.0),
+        )
+        selected.append(best)
+
+    source_coverage = len({sources[i] for i in selected}) / min(len(set(sources)), len(selected))
+    pairs = [similarity[i, j] for k, i in enumerate(selected) for j in selected[k + 1:]]
+    spread = 1 - float(np.mean(pairs)) if pairs else 1.0
+    return [articles[i] for i in selected], min(source_coverage, spread)
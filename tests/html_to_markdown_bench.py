@@ -0,0 +1,110 @@
+"""Micro-benchmark for utils.html_to_markdown on real feed items.
+
+Pulls the raw summary/content HTML of every entry in RSS_FEEDS (or loads a
+previously saved corpus), checks the output matches the plain markdownify
+implementation, and reports entries converted per second for both, in full
+and in the 300-char summary mode.
+
+Usage:
+    uv run python tests/html_to_markdown_bench.py
+    uv run python tests/html_to_markdown_bench.py --save-corpus temp/html_corpus.json
+    uv run python tests/html_to_markdown_bench.py --corpus temp/html_corpus.json
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+import markdownify
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from main import RSS_FEEDS
+from utils import fetch_feeds, html_to_markdown
+
+N_ROUNDS = 5
+SUMMARY_CHARS = 300
+
+
+def reference_html_to_markdown(html_content: str) -> str:
+    """html_to_markdown as it was before the fast path, for comparison."""
+    if not html_content:
+        return ""
+    markdown_text = markdownify.markdownify(html_content)
+    markdown_text = re.sub(r"\n{3,}", "\n\n", markdown_text).strip()
+    markdown_text = re.sub(r"\[([^\]]*)]\([^)]*\)", r"\1", markdown_text)
+    if "【獨媒報導】" in markdown_text:
+        markdown_text = markdown_text.split("【獨媒報導】", 1)[1].strip()
+    return markdown_text
+
+
+def load_corpus() -> list[str]:
+    """Raw summary and content HTML for each entry, as extract_news_data sees them."""
+    feeds, _ = fetch_feeds(RSS_FEEDS)
+    corpus = []
+    for feed in feeds.values():
+        for entry in feed.entries:
+            corpus.append(entry.get("summary", ""))
+            corpus.append(
+                entry.get("content", [{"value": entry.get("summary", "")}])[0].get("value")
+            )
+    return corpus
+
+
+def bench(fn, corpus: list[str]) -> float:
+    """Best-of-N_ROUNDS entries per second (two conversions per entry)."""
+    best = float("inf")
+    for _ in range(N_ROUNDS):
+        start = time.perf_counter()
+        for html_content in corpus:
+            fn(html_content)
+        best = min(best, time.perf_counter() - start)
+    return (len(corpus) / 2) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", help="Load raw HTML corpus from this JSON file")
+    parser.add_argument("--save-corpus", help="Save the fetched raw HTML corpus here")
+    args = parser.parse_args()
+
+    if args.corpus:
+        corpus = json.loads(Path(args.corpus).read_text(encoding="utf-8"))
+    else:
+        corpus = load_corpus()
+    if args.save_corpus:
+        Path(args.save_corpus).write_text(json.dumps(corpus, ensure_ascii=False), encoding="utf-8")
+    print(f"Corpus: {len(corpus)} HTML fragments ({len(corpus) // 2} entries)")
+
+    mismatches = [
+        h
+        for h in corpus
+        if html_to_markdown(h) != reference_html_to_markdown(h)
+        or html_to_markdown(h, max_chars=SUMMARY_CHARS)
+        != reference_html_to_markdown(h)[:SUMMARY_CHARS]
+    ]
+    print(f"Output mismatches vs reference: {len(mismatches)}")
+    for h in mismatches[:5]:
+        print(f"  {h[:120]!r}")
+
+    ref_rate = bench(reference_html_to_markdown, corpus)
+    new_rate = bench(html_to_markdown, corpus)
+    print(f"reference:        {ref_rate:10.1f} entries/s")
+    print(f"html_to_markdown: {new_rate:10.1f} entries/s ({new_rate / ref_rate:.2f}x)")
+
+    ref_summary_rate = bench(lambda h: reference_html_to_markdown(h)[:SUMMARY_CHARS], corpus)
+    summary_rate = bench(lambda h: html_to_markdown(h, max_chars=SUMMARY_CHARS), corpus)
+    print(f"reference[:{SUMMARY_CHARS}]:   {ref_summary_rate:10.1f} entries/s")
+    print(
+        f"max_chars={SUMMARY_CHARS}:    {summary_rate:10.1f} entries/s "
+        f"({summary_rate / ref_summary_rate:.2f}x)"
+    )
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
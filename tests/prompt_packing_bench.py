@@ -0,0 +1,102 @@
+"""Measure what the compact article listing saves in the two heaviest prompts.
+
+Builds the generate_topics and generate_articles_list_by_topic prompts for
+the stored week of Chinese articles twice: with the old repr-of-dicts
+listing and with utils.pack_articles. Reports input tokens for both (via the
+Gemini count_tokens endpoint), and with --call sends each prompt once and
+reports usage_metadata token counts and latency.
+
+Usage:
+    uv run python tests/prompt_packing_bench.py
+    uv run python tests/prompt_packing_bench.py --call
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import gemini
+from article_store import ArticleStore
+from main import NUMBER_OF_TOPICS
+
+
+class _Captured(Exception):
+    def __init__(self, prompt: str):
+        self.prompt = prompt
+
+
+def _capture(*args, prompt: str, **kwargs):
+    raise _Captured(prompt)
+
+
+def legacy_listing(with_ids: bool):
+    """The listing the prompts used before pack_articles."""
+
+    def encode(df: pd.DataFrame, token_budget: int) -> str:
+        if not with_ids:
+            return str(df[["headline", "summary"]].to_dict(orient="records"))
+        return str([
+            {"id": str(i), "headline": row.headline, "summary": row.summary}
+            for i, (_, row) in enumerate(df.iterrows(), start=1)
+        ])
+
+    return encode
+
+
+def build_prompts(df: pd.DataFrame, themes: dict) -> dict[str, str]:
+    prompts = {}
+    original_generate, original_pack = gemini.generate_response, gemini.pack_articles
+    gemini.generate_response = _capture
+    try:
+        for label, topics_pack, grouping_pack in [
+            ("legacy", legacy_listing(False), legacy_listing(True)),
+            ("packed", original_pack, original_pack),
+        ]:
+            gemini.pack_articles = topics_pack
+            try:
+                gemini.generate_topics(df, NUMBER_OF_TOPICS)
+            except _Captured as c:
+                prompts[f"topics/{label}"] = c.prompt
+            gemini.pack_articles = grouping_pack
+            try:
+                gemini.generate_articles_list_by_topic(themes, df)
+            except _Captured as c:
+                prompts[f"grouping/{label}"] = c.prompt
+    finally:
+        gemini.generate_response, gemini.pack_articles = original_generate, original_pack
+    return prompts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--call", action="store_true", help="Also send each prompt once")
+    args = parser.parse_args()
+
+    df = ArticleStore().load_frame()
+    df = df[df["language"].fillna("zh") == "zh"].set_index("uuid")[["headline", "summary"]]
+    themes = {"topics": [f"Topic {i}" for i in range(1, NUMBER_OF_TOPICS + 1)]}
+    prompts = build_prompts(df, themes)
+    client = gemini.get_client()
+
+    print(f"{len(df)} articles, budget {gemini.PROMPT_TOKEN_BUDGET} tokens")
+    print(f"{'prompt':<18} {'chars':>8} {'tokens':>8} {'sent':>8} {'latency':>8}")
+    for name, prompt in prompts.items():
+        tokens = client.models.count_tokens(model=gemini.MODEL, contents=prompt).total_tokens
+        sent = latency = ""
+        if args.call:
+            start = time.perf_counter()
+            response = client.models.generate_content(
+                model=gemini.MODEL, config=gemini.generate_content_config, contents=[prompt]
+            )
+            latency = f"{time.perf_counter() - start:.1f}s"
+            sent = response.usage_metadata.prompt_token_count
+        print(f"{name:<18} {len(prompt):>8} {tokens:>8} {sent:>8} {latency:>8}")
+
+
+if __name__ == "__main__":
+    main()
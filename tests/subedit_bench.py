@@ -0,0 +1,71 @@
+"""Compare single-call and per-topic parallel subediting on a saved digest.
+
+Runs gemini.subedit_summary (and subedit_summary_en with --en) on the
+pre-edit summaries of an earlier run, once per mode per round, and reports
+wall time and total tokens (usage_metadata.total_token_count) for each.
+
+Usage:
+    uv run python tests/subedit_bench.py temp/20250101-090000
+    uv run python tests/subedit_bench.py temp/20250101-090000 --en --rounds 3
+"""
+
+import argparse
+import json
+import logging
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import gemini
+
+logging.basicConfig(level=logging.WARNING)
+
+_tokens = 0
+_tokens_lock = threading.Lock()
+_call_model = gemini._call_model
+
+
+def _counting_call_model(*args, **kwargs):
+    """gemini._call_model, also adding its tokens to the benchmark total."""
+    global _tokens
+    before = gemini.last_call_cost()[0]
+    try:
+        return _call_model(*args, **kwargs)
+    finally:
+        with _tokens_lock:
+            _tokens += gemini.last_call_cost()[0] - before
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("run_dir", type=Path, help="Run directory with saved stage artifacts")
+    parser.add_argument("--en", action="store_true", help="Benchmark the English subeditor")
+    parser.add_argument("--rounds", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.en:
+        source = args.run_dir / "08-en_translated.json"
+        subedit = gemini.subedit_summary_en
+    else:
+        source = args.run_dir / "05-topics_summary_pre_edit.json"
+        subedit = gemini.subedit_summary
+    topics_summary = json.loads(source.read_text(encoding="utf-8"))
+    gemini._call_model = _counting_call_model
+
+    global _tokens
+    print(f"{len(topics_summary['topics'])} topics from {source}")
+    print(f"{'mode':<12} {'round':>5} {'wall':>8} {'tokens':>8}")
+    for round_ in range(1, args.rounds + 1):
+        for mode, per_topic in [("single", False), ("per-topic", True)]:
+            _tokens = 0
+            start = time.perf_counter()
+            subedit(json.loads(json.dumps(topics_summary)), per_topic=per_topic)
+            elapsed = time.perf_counter() - start
+            print(f"{mode:<12} {round_:>5} {elapsed:>7.1f}s {_tokens:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Compare single-call and per-topic parallel English translation on a saved run.
+
+Extracts the proper-noun glossary from the run's matched English articles
+(07-en_articles_by_topic.json) without touching the persistent glossary,
+then translates the run's Chinese digest (03-topics_summary.json) once per
+mode per round. Reports wall time and total tokens
+(usage_metadata.total_token_count) of each step. With --concurrent the
+glossary overlaps the Chinese digest, so only the translation is on the
+English critical path.
+
+Usage:
+    uv run python tests/translate_bench.py temp/20250101-090000
+    uv run python tests/translate_bench.py temp/20250101-090000 --rounds 3
+"""
+
+import argparse
+import json
+import logging
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import gemini
+import main as pipeline
+from article_store import ArticleStore
+
+logging.basicConfig(level=logging.WARNING)
+
+_tokens = 0
+_tokens_lock = threading.Lock()
+_call_model = gemini._call_model
+
+
+def _counting_call_model(*args, **kwargs):
+    """gemini._call_model, also adding its tokens to the benchmark total."""
+    global _tokens
+    before = gemini.last_call_cost()[0]
+    try:
+        return _call_model(*args, **kwargs)
+    finally:
+        with _tokens_lock:
+            _tokens += gemini.last_call_cost()[0] - before
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("run_dir", type=Path, help="Run directory with saved stage artifacts")
+    parser.add_argument("--rounds", type=int, default=1)
+    args = parser.parse_args()
+
+    zh_summary = json.loads((args.run_dir / "03-topics_summary.json").read_text(encoding="utf-8"))
+    en_matched = json.loads(
+        (args.run_dir / "07-en_articles_by_topic.json").read_text(encoding="utf-8")
+    )
+    df = ArticleStore().load_frame().set_index("uuid")
+    gemini._call_model = _counting_call_model
+
+    global _tokens
+    print(f"{len(zh_summary['topics'])} topics from {args.run_dir}")
+    print(f"{'step':<12} {'round':>5} {'wall':>8} {'tokens':>8}")
+    for round_ in range(1, args.rounds + 1):
+        _tokens = 0
+        start = time.perf_counter()
+        # A scratch store and run dir, so the bench neither reads nor grows
+        # the real glossary nor overwrites the run's artifacts
+        with tempfile.TemporaryDirectory() as scratch:
+            pipeline.GLOSSARY_PATH = Path(scratch) / "glossary.json"
+            glossary = pipeline.build_english_glossary(en_matched, df, Path(scratch))
+        print(f"{'glossary':<12} {round_:>5} {time.perf_counter() - start:>7.1f}s {_tokens:>8}")
+        for mode, per_topic in [("single", False), ("per-topic", True)]:
+            _tokens = 0
+            start = time.perf_counter()
+            gemini.translate_digest_to_english(zh_summary, glossary, per_topic=per_topic)
+            elapsed = time.perf_counter() - start
+            print(f"{mode:<12} {round_:>5} {elapsed:>7.1f}s {_tokens:>8}")
+
+
+if __name__ == "__main__":
+    main()
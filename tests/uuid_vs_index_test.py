@@ -16,6 +16,7 @@ import pandas as pd
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
 import gemini
+from article_store import ArticleStore
 from response_model import ArticlesByTopic
 
 logging.basicConfig(level=logging.INFO)
@@ -23,13 +24,12 @@ logger = logging.getLogger(__name__)
 
 N_TRIALS = 5
 N_TOPICS = 5
-ARTICLES_PATH = Path("data/articles.jsonl")
 OUT_DIR = Path("temp/uuid_vs_index")
 OUT_DIR.mkdir(parents=True, exist_ok=True)
 
 
 def load_zh_articles() -> pd.DataFrame:
-    df = pd.read_json(ARTICLES_PATH, lines=True)
+    df = ArticleStore().load_frame()
     if "language" not in df.columns:
         df["language"] = "zh"
     df["language"] = df["language"].fillna("zh")
@@ -1,15 +1,33 @@
+import html
+import itertools
 import json
 import logging
 import re
+import time
 import warnings
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
 from uuid import uuid4
 
 import feedparser
 import markdownify
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup, MarkupResemblesLocatorWarning
 
+from feed_cache import FeedCache
+from scrape_cache import ScrapeCache, content_hash
+
 warnings.filterwarnings("ignore", category=MarkupResemblesLocatorWarning)
 
 logger = logging.getLogger(__name__)
@@ -20,42 +38,291 @@ _HEADERS = {
 
 MIN_CONTENT_LENGTH = 100
 
-
-def _scrape_article(url: str) -> str:
+_EXCESS_NEWLINES_RE = re.compile(r"\n{3,}")
+_MARKDOWN_LINK_RE = re.compile(r"\[([^\]]*)]\([^)]*\)")
+# Anything markdownify would rewrite in plain text: markup, entities, the
+# characters it escapes, and whitespace runs it collapses.
+_NEEDS_MARKDOWNIFY_RE = re.compile(r"[<>&*_\\\t\r\f\v]|[ \n]{2,}")
+_PARAGRAPHS_RE = re.compile(r"\s*(?:<p>[^<>]*</p>\s*)+")
+_PARAGRAPH_TEXT_RE = re.compile(r"<p>([^<>]*)</p>")
+_BARE_AMPERSAND_RE = re.compile(r"&(?!#[0-9]+;|#[xX][0-9a-fA-F]+;|[A-Za-z][A-Za-z0-9]*;)")
+# Containers and inline wrappers whose markdown depends on their closing tag;
+# never cut inside one
+_WRAPPER_TAGS = (
+    "blockquote", "table", "ul", "ol", "pre",
+    "strong", "b", "em", "i", "u", "s", "del", "code", "span", "a", "sup", "sub",
+)
+_WRAPPER_TAG_RE = re.compile(r"<(/?)(" + "|".join(_WRAPPER_TAGS) + r")\b")
+_TRUNCATE_MARGIN = 50
+_WHITESPACE_RE = re.compile(r"\s+")
+
+SCRAPE_TIMEOUT = 15  # seconds per article page request
+SCRAPE_DEADLINE = 120  # seconds for the whole scraping stage of a run
+MAX_SCRAPES_PER_HOST = 4
+
+FEED_TIMEOUT = 20  # seconds per feed, wall clock from request to last byte
+FEED_DEADLINE = 60  # seconds for fetching all feeds of a run
+FEED_CHUNK_SIZE = 64 * 1024
+MAX_FEED_WORKERS = 8
+
+
+def _scrape_article(
+    url: str,
+    session: requests.Session | None = None,
+    cache: ScrapeCache | None = None,
+) -> str:
     """Fetch article page and extract body text as markdown."""
+    if cache is not None:
+        cached = cache.get(url)
+        if cached is not None:
+            return cached
     try:
-        resp = requests.get(url, headers=_HEADERS, timeout=15)
+        resp = (session or requests).get(url, headers=_HEADERS, timeout=SCRAPE_TIMEOUT)
         resp.raise_for_status()
-        soup = BeautifulSoup(resp.text, "html.parser")
-        article = soup.find("article") or soup.find("body")
-        if article is None:
-            return ""
-        for tag in article.find_all(["script", "style", "nav", "footer", "header"]):
-            tag.decompose()
-        return html_to_markdown(str(article))
+        digest = content_hash(resp.content)
+        markdown = cache.get_by_hash(digest) if cache is not None else None
+        if markdown is None:
+            soup = BeautifulSoup(resp.text, "html.parser")
+            article = soup.find("article") or soup.find("body")
+            if article is None:
+                markdown = ""
+            else:
+                for tag in article.find_all(["script", "style", "nav", "footer", "header"]):
+                    tag.decompose()
+                markdown = html_to_markdown(str(article))
+        if cache is not None:
+            cache.put(url, digest, markdown)
+        return markdown
     except Exception as e:
         logger.warning("Failed to scrape %s: %s", url, e)
         return ""
 
 
+def scrape_articles(
+    urls: list[str],
+    deadline: float = SCRAPE_DEADLINE,
+    cache: ScrapeCache | None = None,
+) -> dict[str, str]:
+    """Scrape article pages concurrently.
+
+    Each host gets its own pooled requests.Session and at most
+    MAX_SCRAPES_PER_HOST requests in flight. Pages not finished within
+    deadline seconds are abandoned. Returns url -> markdown for pages that
+    scraped to non-empty text; failures stay soft, as in _scrape_article.
+    """
+    urls_by_host: dict[str, list[str]] = {}
+    for url in dict.fromkeys(urls):
+        urls_by_host.setdefault(urlsplit(url).netloc, []).append(url)
+    if not urls_by_host:
+        return {}
+
+    sessions: dict[str, requests.Session] = {}
+    for host in urls_by_host:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=MAX_SCRAPES_PER_HOST)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        sessions[host] = session
+
+    # Each host keeps up to MAX_SCRAPES_PER_HOST pages in flight and submits
+    # its next page only when one finishes, so no worker ever waits on a busy
+    # host while another host's pages are queued.
+    n_workers = sum(min(len(u), MAX_SCRAPES_PER_HOST) for u in urls_by_host.values())
+    executor = ThreadPoolExecutor(max_workers=n_workers)
+    queued = {host: deque(host_urls) for host, host_urls in urls_by_host.items()}
+    in_flight: dict[Future, tuple[str, str]] = {}
+
+    def submit_next(host: str) -> None:
+        if queued[host]:
+            url = queued[host].popleft()
+            in_flight[executor.submit(_scrape_article, url, sessions[host], cache)] = (host, url)
+
+    for host in urls_by_host:
+        for _ in range(MAX_SCRAPES_PER_HOST):
+            submit_next(host)
+
+    n_pages = sum(len(u) for u in urls_by_host.values())
+    results: dict[str, str] = {}
+    start = time.perf_counter()
+    try:
+        while in_flight:
+            done, _ = wait(
+                in_flight, timeout=deadline - (time.perf_counter() - start),
+                return_when=FIRST_COMPLETED,
+            )
+            if not done:
+                unfinished = len(in_flight) + sum(len(q) for q in queued.values())
+                logger.warning(
+                    "Scrape deadline of %ss reached, abandoning %d/%d pages",
+                    deadline, unfinished, n_pages,
+                )
+                break
+            for future in done:
+                host, url = in_flight.pop(future)
+                markdown = future.result()
+                if markdown:
+                    results[url] = markdown
+                submit_next(host)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    logger.info(
+        "Scraped %d/%d pages from %d hosts in %.2fs",
+        len(results), n_pages, len(urls_by_host), time.perf_counter() - start,
+    )
+    if cache is not None:
+        logger.info("Scrape cache: %d hits, %d misses", cache.hits, cache.misses)
+    return results
+
+
+def _fetch_feed(
+    feed_title: str, feed_url: str, feed_cache: FeedCache | None = None
+) -> feedparser.FeedParserDict | None:
+    """Download a feed within FEED_TIMEOUT seconds and parse it.
+
+    Returns None when feed_cache is given and the server reports the feed
+    unchanged (304), in which case nothing is parsed.
+    """
+    start = time.perf_counter()
+    headers = dict(_HEADERS)
+    if feed_cache is not None:
+        headers.update(feed_cache.conditional_headers(feed_url))
+    with requests.get(feed_url, headers=headers, timeout=FEED_TIMEOUT, stream=True) as resp:
+        if resp.status_code == 304 and feed_cache is not None:
+            feed_cache.record_not_modified(feed_url)
+            logger.info("Feed %s not modified, skipping parse", feed_title)
+            return None
+        resp.raise_for_status()
+        # The requests timeout bounds each socket read, not the whole body, so
+        # a host trickling bytes is cut off here instead
+        chunks = []
+        while chunk := resp.raw.read1(FEED_CHUNK_SIZE, decode_content=True):
+            if time.perf_counter() - start > FEED_TIMEOUT:
+                raise TimeoutError(f"feed body not received within {FEED_TIMEOUT}s")
+            chunks.append(chunk)
+        content = b"".join(chunks)
+
+    parse_start = time.perf_counter()
+    feed = feedparser.parse(content, response_headers=dict(resp.headers))
+    if feed_cache is not None:
+        feed_cache.record_fetch(
+            feed_url, resp.headers, len(content), time.perf_counter() - parse_start
+        )
+    logger.info(
+        "Fetched %s: %d entries in %.2fs",
+        feed_title, len(feed.entries), time.perf_counter() - start,
+    )
+    return feed
+
+
+def fetch_feeds(
+    rss_feeds: dict[str, str],
+    feed_cache: FeedCache | None = None,
+) -> tuple[dict[str, feedparser.FeedParserDict], dict[str, Exception]]:
+    """Fetch all feeds concurrently.
+
+    Returns (feeds, errors), both keyed by feed title. A feed that fails or
+    times out appears only in errors, so one slow host cannot hold up the rest.
+    Feeds reported unchanged via feed_cache appear in neither.
+    """
+    feeds: dict[str, feedparser.FeedParserDict] = {}
+    errors: dict[str, Exception] = {}
+    if not rss_feeds:
+        return feeds, errors
+
+    executor = ThreadPoolExecutor(max_workers=min(MAX_FEED_WORKERS, len(rss_feeds)))
+    futures = {
+        executor.submit(_fetch_feed, feed_title, feed_url, feed_cache): feed_title
+        for feed_title, feed_url in rss_feeds.items()
+    }
+    try:
+        for future in as_completed(futures, timeout=FEED_DEADLINE):
+            feed_title = futures[future]
+            try:
+                feed = future.result()
+            except Exception as e:
+                logger.warning("Failed to fetch feed %s: %s", feed_title, e)
+                errors[feed_title] = e
+                continue
+            if feed is not None:
+                feeds[feed_title] = feed
+    except TimeoutError:
+        stragglers = sorted(t for f, t in futures.items() if not f.done())
+        for feed_title in stragglers:
+            errors[feed_title] = TimeoutError(f"not fetched within {FEED_DEADLINE}s")
+        logger.warning("Feed deadline of %ss reached, skipping %s", FEED_DEADLINE, stragglers)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return feeds, errors
+
+
+def _published_utc(entry: feedparser.FeedParserDict) -> str | None:
+    """Canonical UTC ISO timestamp from feedparser's already-parsed date."""
+    parsed = entry.get("published_parsed") or entry.get("updated_parsed")
+    if parsed is None:
+        return None
+    return datetime(*parsed[:6], tzinfo=timezone.utc).isoformat()
+
+
 def extract_news_data(
     rss_feeds: dict[str, str],
     english_sources: set[str] | None = None,
+    feed_cache: FeedCache | None = None,
+    known_urls: set[str] | Callable[[str], bool] | None = None,
+    scrape_cache: ScrapeCache | None = None,
 ) -> list[dict]:
+    """Fetch rss_feeds and convert their entries to article dicts.
+
+    With feed_cache, feeds are polled with conditional requests and feeds the
+    server reports unchanged contribute no entries, since every entry in them
+    was already returned by an earlier run. The caller is responsible for
+    calling feed_cache.save() once those earlier results are persisted.
+
+    known_urls (a set, or a predicate on the entry link) marks entries the
+    caller already has; they are left out before any markdown conversion or
+    scraping is done. scrape_cache, if given, serves previously scraped pages.
+    """
     if english_sources is None:
         english_sources = set()
+    if known_urls is None:
+        is_known = None
+    elif callable(known_urls):
+        is_known = known_urls
+    else:
+        is_known = known_urls.__contains__
+    feeds, errors = fetch_feeds(rss_feeds, feed_cache)
+    if errors:
+        logger.warning("Skipped %d/%d feeds: %s", len(errors), len(rss_feeds), sorted(errors))
+    if feed_cache is not None and feed_cache.not_modified:
+        logger.info(
+            "Feed cache: %d/%d feeds not modified, saved %d bytes and %.2fs of parsing",
+            feed_cache.not_modified,
+            len(rss_feeds),
+            feed_cache.bytes_saved,
+            feed_cache.parse_seconds_saved,
+        )
+
     news_items = []
-    for feed_title, feed_url in rss_feeds.items():
+    skipped = 0
+    # Iterate in rss_feeds order so output order does not depend on fetch timing
+    for feed_title in rss_feeds:
+        feed = feeds.get(feed_title)
+        if feed is None:
+            continue
         logger.info("Extracting news data from %s...", feed_title)
 
-        feed = feedparser.parse(feed_url)
-
         for entry in feed.entries:
+            if is_known is not None and entry.get("link") and is_known(entry.get("link")):
+                skipped += 1
+                continue
+
             news_item = {
                 "uuid": uuid4().hex,
                 "headline": entry.get("title"),
                 "published": entry.get("published"),
-                "summary": html_to_markdown(entry.get("summary", ""))[:300],
+                "published_utc": _published_utc(entry),
+                "summary": html_to_markdown(entry.get("summary", ""), max_chars=300),
                 "content": html_to_markdown(
                     entry.get("content", [{"value": entry.get("summary", "")}])[0].get(
                         "value"
@@ -66,25 +333,59 @@ def extract_news_data(
                 "language": "en" if feed_title in english_sources else "zh",
             }
 
-            if len(news_item["content"]) < MIN_CONTENT_LENGTH and news_item["url"]:
-                scraped = _scrape_article(news_item["url"])
-                if scraped:
-                    news_item["content"] = scraped
-
             news_items.append(news_item)
 
+    # Scrape full text for entries whose feed content is too short, all at once
+    # rather than one blocking request per entry
+    short_items = [
+        item
+        for item in news_items
+        if len(item["content"]) < MIN_CONTENT_LENGTH and item["url"]
+    ]
+    if short_items:
+        scraped = scrape_articles([item["url"] for item in short_items], cache=scrape_cache)
+        for item in short_items:
+            if item["url"] in scraped:
+                item["content"] = scraped[item["url"]]
+
+    if skipped:
+        # Each skipped entry saves a summary and a content conversion
+        logger.info(
+            "Skipped %d known entries (%d markdown conversions)", skipped, skipped * 2
+        )
     return news_items
 
 
-def html_to_markdown(html_content: str) -> str:
-    if not html_content:
-        return ""
+def _markdownify_fast(html_content: str) -> str | None:
+    """markdownify output for input simple enough to convert without parsing.
 
-    markdown_text = markdownify.markdownify(html_content)
+    Handles plain text and runs of bare <p> paragraphs whose text markdownify
+    would pass through untouched. Returns None for anything else.
+    """
+    if not _NEEDS_MARKDOWNIFY_RE.search(html_content):
+        return html_content
+    if not _PARAGRAPHS_RE.fullmatch(html_content):
+        return None
 
+    paragraphs = []
+    for raw in _PARAGRAPH_TEXT_RE.findall(html_content):
+        if "&" in raw:
+            if _BARE_AMPERSAND_RE.search(raw):
+                return None
+            raw = html.unescape(raw)
+        if not raw:
+            continue
+        if _NEEDS_MARKDOWNIFY_RE.search(raw) or raw[0].isspace() or raw[-1].isspace():
+            return None
+        paragraphs.append(raw)
+    return "\n\n".join(paragraphs)
+
+
+def _clean_markdown(markdown_text: str) -> str:
     # Remove markdown links and excessive newlines
-    markdown_text = re.sub(r"\n{3,}", "\n\n", markdown_text).strip()
-    markdown_text = re.sub(r"\[([^\]]*)]\([^)]*\)", r"\1", markdown_text)
+    markdown_text = _EXCESS_NEWLINES_RE.sub("\n\n", markdown_text).strip()
+    if "](" in markdown_text:
+        markdown_text = _MARKDOWN_LINK_RE.sub(r"\1", markdown_text)
 
     if "【獨媒報導】" in markdown_text:
         markdown_text = markdown_text.split("【獨媒報導】", 1)[1].strip()
@@ -92,6 +393,70 @@ def html_to_markdown(html_content: str) -> str:
     return markdown_text
 
 
+def _paragraph_boundary(lowered: str, min_end: int) -> int | None:
+    """First offset >= min_end just after a </p> with no container or inline wrapper open.
+
+    Cutting the HTML there leaves a prefix whose markdown is a prefix of the
+    full document's markdown.
+    """
+    idx = lowered.find("</p>", max(min_end - 4, 0))
+    while idx != -1:
+        end = idx + 4
+        depth: dict[str, int] = {}
+        for closing, tag in _WRAPPER_TAG_RE.findall(lowered, 0, end):
+            depth[tag] = depth.get(tag, 0) + (-1 if closing else 1)
+        if not any(depth.values()):
+            return end
+        idx = lowered.find("</p>", end)
+    return None
+
+
+def _truncated_markdown(html_content: str, max_chars: int) -> str | None:
+    """html_to_markdown(html_content)[:max_chars], converting only a prefix.
+
+    Grows a prefix of whole top-level paragraphs until it yields enough text.
+    Returns None when the shortcut cannot guarantee identical output, or when
+    it would end up converting the whole document anyway.
+    """
+    if "【獨媒報導】" in html_content:
+        return None
+    lowered = html_content.lower()
+    wanted = max_chars + _TRUNCATE_MARGIN
+    min_end = wanted
+    while True:
+        end = _paragraph_boundary(lowered, min_end)
+        if end is None or end >= len(html_content.rstrip()):
+            return None
+        text = _clean_markdown(markdownify.markdownify(html_content[:end]))
+        if "[" in text:
+            # An unclosed bracket could pair with a link further on
+            return None
+        if len(text) >= wanted:
+            return text[:max_chars]
+        min_end = 2 * end
+
+
+def html_to_markdown(html_content: str, max_chars: int | None = None) -> str:
+    """Convert feed or page HTML to plain markdown text.
+
+    With max_chars, returns the same as html_to_markdown(html_content)[:max_chars]
+    but stops converting long documents once enough text has been produced.
+    """
+    if not html_content:
+        return ""
+
+    markdown_text = _markdownify_fast(html_content)
+    if markdown_text is None and max_chars is not None:
+        truncated = _truncated_markdown(html_content, max_chars)
+        if truncated is not None:
+            return truncated
+    if markdown_text is None:
+        markdown_text = markdownify.markdownify(html_content)
+
+    markdown_text = _clean_markdown(markdown_text)
+    return markdown_text if max_chars is None else markdown_text[:max_chars]
+
+
 def generate_article_text(articles: list[str], df: pd.DataFrame) -> str:
     parts = []
     for uuid in articles:
@@ -100,6 +465,62 @@ def generate_article_text(articles: list[str], df: pd.DataFrame) -> str:
     return "\n\n".join(parts)
 
 
+def estimate_tokens(text: str) -> int:
+    """Rough, deliberately high Gemini token count: one per CJK character, four other characters per token."""
+    wide = sum(1 for ch in text if ch >= "\u2e80")
+    return wide + (len(text) - wide + 3) // 4
+
+
+def pack_articles(df: pd.DataFrame, token_budget: int, start: int = 1) -> str:
+    """Compact prompt listing of articles: one "id | headline | summary" line each.
+
+    Ids are row positions counted from start. If df has a "reports" column,
+    headlines standing for n > 1 merged reports get an "(×n)" suffix. Link
+    targets and whitespace runs are stripped; if the listing would exceed
+    token_budget, every summary is cut to the same (largest fitting) length.
+    Headlines are never cut.
+    """
+    reports = df["reports"] if "reports" in df.columns else [1] * len(df)
+    heads = []
+    summaries = []
+    for i, (headline, summary, n) in enumerate(
+        zip(df["headline"], df["summary"], reports), start=start
+    ):
+        suffix = f" (×{n})" if n > 1 else ""
+        heads.append(f"{i} | {_WHITESPACE_RE.sub(' ', str(headline)).strip()}{suffix} | ")
+        summary = _MARKDOWN_LINK_RE.sub(r"\1", str(summary or ""))
+        summaries.append(_WHITESPACE_RE.sub(" ", summary).strip())
+
+    # Estimated tokens of each summary's first n characters, for every n
+    prefix_costs = []
+    for summary in summaries:
+        costs = [0]
+        for ch in summary:
+            costs.append(costs[-1] + (1 if ch >= "\u2e80" else 0.25))
+        prefix_costs.append(costs)
+    fixed = sum(estimate_tokens(head) + 1 for head in heads)
+
+    def cost(max_chars: int) -> float:
+        return fixed + sum(costs[min(max_chars, len(costs) - 1)] for costs in prefix_costs)
+
+    max_chars = max((len(s) for s in summaries), default=0)
+    if cost(max_chars) > token_budget:
+        lo, hi = 0, max_chars
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if cost(mid) <= token_budget:
+                lo = mid
+            else:
+                hi = mid - 1
+        max_chars = lo
+        logger.info(
+            "Prompt over %d-token budget, summaries cut to %d characters",
+            token_budget, max_chars,
+        )
+
+    return "\n".join(head + summary[:max_chars] for head, summary in zip(heads, summaries))
+
+
 def deduplicate_articles_by_url(articles: list[str], df: pd.DataFrame) -> list[str]:
     """Remove duplicate articles that share the same URL."""
     seen_urls: set[str] = set()
@@ -112,6 +533,22 @@ def deduplicate_articles_by_url(articles: list[str], df: pd.DataFrame) -> list[s
     return unique
 
 
+def deduplicate_articles_by_cluster(articles: list[str], df: pd.DataFrame) -> list[str]:
+    """Keep the first article of each near-duplicate cluster (dup_cluster, tagged at ingest)."""
+    if "dup_cluster" not in df.columns:
+        return articles
+    seen_clusters: set[str] = set()
+    unique: list[str] = []
+    for uuid in articles:
+        cluster = df.loc[uuid, "dup_cluster"]
+        if pd.isna(cluster):
+            cluster = uuid
+        if cluster not in seen_clusters:
+            seen_clusters.add(cluster)
+            unique.append(uuid)
+    return unique
+
+
 def generate_article_links(articles: list[str], df: pd.DataFrame) -> str:
     lines = []
     for uuid in articles:
@@ -202,3 +639,59 @@ def extract_json_to_dict(text: str) -> dict | None:
 
     json_content, _, _ = after.partition("```")
     return json.loads(json_content.strip())
+
+
+def parse_partial_json(text: str) -> dict | None:
+    """Best-effort parse of a JSON object that is still being streamed.
+
+    Takes the (possibly unterminated) ```json block, or the raw text if there
+    is no fence yet, closes any open string, array and object, and drops a
+    trailing key or element that cannot be completed. Returns None if no
+    object has started.
+    """
+    _, marker, after = text.partition("```json")
+    body = (after if marker else text).partition("```")[0]
+    start = body.find("{")
+    if start < 0:
+        return None
+    body = body[start:]
+
+    # Positions where the text can be cut and closed, with the closers needed
+    cut_points: list[tuple[int, str]] = []
+    closers: list[str] = []
+    in_string = escaped = False
+    for i, ch in enumerate(body):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            closers.append("}" if ch == "{" else "]")
+            cut_points.append((i + 1, "".join(reversed(closers))))
+        elif ch in "}]":
+            if closers:
+                closers.pop()
+            cut_points.append((i + 1, "".join(reversed(closers))))
+        elif ch == ",":
+            cut_points.append((i, "".join(reversed(closers))))
+
+    tail = ('"' if in_string and not escaped else "") + "".join(reversed(closers))
+    # Built lazily from the end: the whole text or its last cut point
+    # almost always parses, so each call stays linear in the text
+    candidates = itertools.chain(
+        [body + tail], (body[:end] + close for end, close in reversed(cut_points))
+    )
+    for candidate in candidates:
+        try:
+            data = json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(data, dict):
+            return data
+    return None